@@ -1,9 +1,17 @@
 import os
+import argparse
 from dotenv import load_dotenv
-from src.modules.graph import build_flipkart_scraper_graph
-from IPython import display
+from src.modules.graph import get_graph
 from playwright.async_api import async_playwright
-from src.modules.helper import call_agent, read_file
+from src.modules.helper import call_agent, read_resource, install_mark_page
+from src.modules.auth import new_context, open_logged_in, confirm_login, save_storage_state, FLIPKART_ORDERS_URL
+from src.modules.cassette import Cassette
+from src.modules.tracing import Tracer
+from src.modules.llm_cache import LLMCache, CALL_KINDS
+from src.modules.macros import MacroCache
+from src.modules.checkpoint import Checkpointer
+from src.modules.profile import apply_profile
+from src.modules.struct import PageProfile, RoutingConfig
 import asyncio
 
 load_dotenv()
@@ -11,23 +19,78 @@ load_dotenv()
 os.environ['LANGCHAIN_TRACING_V2'] = 'true'
 os.environ['LANGCHAIN_PROJECT'] = 'flipkart-scraping'
 
-graph = build_flipkart_scraper_graph()
-
-async def main():
+async def main(start_url:str, storage_state:str, cassette:Cassette|None, trace_path:str|None, llm_cache:LLMCache|None, macros:MacroCache|None, checkpointer:Checkpointer|None, stream:bool, profile:PageProfile, routing:RoutingConfig|None):
 
     browser = await async_playwright().start()
-    browser = await browser.firefox.launch(headless=False, args=None)
-    page = await browser.new_page()
-    _ = await page.goto("https://www.google.com")
+    browser = await browser.firefox.launch(headless=profile.headless, args=None)
+    context, restored = await new_context(browser, storage_state)
+    if cassette:
+        await cassette.attach(context)
+    network_stats = await apply_profile(context, profile)
+    await install_mark_page(context)
+    page = await context.new_page()
+
+    user_input = read_resource("prompts/user_prompt.txt")
 
-    user_input = read_file("src/prompts/user_prompt.txt")
+    # With a restored login, start directly on the orders page. If the site asks for the login again, fall back to the full flow with the login handoff.
+    if restored and await open_logged_in(page, start_url or FLIPKART_ORDERS_URL):
+        user_input = read_resource("prompts/logged_in_prompt.txt") + user_input
+    else:
+        _ = await page.goto(start_url or "https://www.google.com")
 
-    await call_agent(user_input, page, graph, max_steps=300)
+    tracer = Tracer() if trace_path else None
+    await call_agent(user_input, page, get_graph(), max_steps=300, configurable={'cassette': cassette, 'llm_cache': llm_cache, 'macros': macros}, tracer=tracer, checkpointer=checkpointer, stream=stream, routing=routing)
+    if tracer:
+        tracer.export(trace_path)
+    if llm_cache:
+        print(f"LLM cache: {llm_cache}")
+    if macros:
+        print(f"Navigation macros: {macros}")
+    await network_stats.wait_measurements()
+    network_stats.print_summary()
+    if cassette and cassette.mode == 'replay':
+        print(f"Replay finished with {cassette.mismatches} prompt mismatches.")
+    elif await confirm_login(context):
+        await save_storage_state(context, storage_state)
+    else:
+        print("The login was not completed, so the login state was not saved.")
 
     close_browser = input("Close the browser? (y/n): ")
     if close_browser:
-        await page.close()
+        # Closing the context also writes the network recording of the cassette.
+        await context.close()
         await browser.close()
 
 if __name__=="__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extracts the orders from Flipkart.")
+    parser.add_argument('--start-url', default=None, help="The page to start on. Defaults to the orders page when the login is restored, else to google.com.")
+    parser.add_argument('--storage-state', default=".auth/flipkart.json", help="Where the login state is saved after a successful run, and restored from.")
+    parser.add_argument('--record', metavar='DIR', default=None, help="Record the llm calls, the user responses and the network traffic into a cassette directory.")
+    parser.add_argument('--replay', metavar='DIR', default=None, help="Replay a recorded cassette directory, without calling the llm or the live site.")
+    parser.add_argument('--trace', metavar='PATH', default=None, help="Time every graph node, runnable and Playwright call, and write the p50/p95 summary to PATH. JSON if PATH ends with .json, else the Prometheus text format.")
+    parser.add_argument('--llm-cache', metavar='DIR', default=None, help="Serve repeated prompts, like the ones of the navigation to the orders page, from a response cache in DIR.")
+    parser.add_argument('--llm-cache-skip', metavar='KIND', nargs='+', default=(), choices=CALL_KINDS, help="Kinds of llm calls which bypass the cache: the tier of the call, 'main' or 'cheap', or its observation of the page, 'screenshot', 'unchanged' or 'text_only'.")
+    parser.add_argument('--macros', metavar='PATH', default=None, help="Learn the navigation to the orders page into PATH, and replay it without calling the llm in later runs.")
+    parser.add_argument('--checkpoint', metavar='PATH', default=None, help="Save the state after every step to PATH. If PATH holds the checkpoint of an incomplete run, that run is resumed.")
+    parser.add_argument('--stream', action='store_true', help="Print the thoughts of the model live, and run each tool as soon as its arguments are complete.")
+    parser.add_argument('--headless', action='store_true', help="Run the browser without a window. Needs a saved login state, since the login handoff needs a window.")
+    parser.add_argument('--no-blocking', action='store_true', help="Download every resource of the pages, including the images, fonts, ads and trackers.")
+    parser.add_argument('--measure-saved-bytes', action='store_true', help="Send a HEAD request for every blocked resource in the background, to report the kB saved by the blocking of each navigation.")
+    parser.add_argument('--cheap-model', metavar='MODEL', default=None, help="Send the routine steps, like another scroll on the same page, to MODEL without the screenshot. Invalid calls of MODEL are retried with the main model.")
+    args = parser.parse_args()
+    cassette = None
+    if args.replay:
+        cassette = Cassette(args.replay, 'replay')
+        os.environ['LANGCHAIN_TRACING_V2'] = 'false'
+    elif args.record:
+        cassette = Cassette(args.record, 'record')
+    llm_cache = LLMCache(args.llm_cache, skip_kinds=args.llm_cache_skip) if args.llm_cache else None
+    macros = MacroCache(args.macros) if args.macros else None
+    checkpointer = Checkpointer(args.checkpoint) if args.checkpoint else None
+    # The HEAD requests would reach the live site, which a replay must not do.
+    measure_saved_bytes = args.measure_saved_bytes and not args.replay
+    profile = PageProfile(headless=args.headless, measure_saved_bytes=measure_saved_bytes)
+    if args.no_blocking:
+        profile = PageProfile(headless=args.headless, measure_saved_bytes=measure_saved_bytes, block_resource_types=[], block_url_patterns=[])
+    routing = RoutingConfig(cheap_model=args.cheap_model) if args.cheap_model else None
+    asyncio.run(main(args.start_url, args.storage_state, cassette, args.trace, llm_cache, macros, checkpointer, args.stream, profile, routing))
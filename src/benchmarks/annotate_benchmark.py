@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import base64
+import statistics
+import time
+from playwright.async_api import async_playwright, Page
+from src.modules.helper import mark_page, read_resource, install_mark_page
+from src.benchmarks.mark_page_benchmark import build_synthetic_dom
+
+
+async def legacy_mark_page(page: Page)->dict:
+    """The annotate flow before the script was installed once per context: the full script source is evaluated on every step, followed by separate markPage, screenshot and unmarkPage round trips."""
+    await page.evaluate(read_resource("scripts/mark_page.js"))
+    bboxes = await page.evaluate("markPage()")
+    screenshot = await page.screenshot()
+    await page.evaluate("unmarkPage()")
+    return {"img": base64.b64encode(screenshot).decode(), "bboxes": bboxes}
+
+
+async def time_steps(func, page: Page, steps:int)->list:
+    """Times `steps` consecutive annotate calls, in milliseconds."""
+    timings = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        await func(page)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def benchmark(num_nodes:int, steps:int, browser_name:str):
+    """Prints the per-step annotate latency of the legacy and the current flow on a synthetic page.
+
+    Args:
+        num_nodes (int): The approximate number of elements on the synthetic page.
+        steps (int): The number of annotate steps to time for each flow.
+        browser_name (str): The playwright browser to use.
+    """
+    html = build_synthetic_dom(num_nodes)
+    async with async_playwright() as p:
+        browser = await getattr(p, browser_name).launch(headless=True)
+
+        legacy_page = await browser.new_page(viewport={'width':1280, 'height':800})
+        await legacy_page.set_content(html)
+        legacy = await time_steps(legacy_mark_page, legacy_page, steps)
+
+        context = await browser.new_context(viewport={'width':1280, 'height':800})
+        await install_mark_page(context)
+        page = await context.new_page()
+        await page.set_content(html)
+        current = await time_steps(lambda page: mark_page.ainvoke({'page': page}), page, steps)
+
+        await browser.close()
+
+    print(f"{'flow':>8} {'median ms':>10} {'p95 ms':>8}")
+    for name, timings in (('legacy', legacy), ('current', current)):
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        print(f"{name:>8} {statistics.median(timings):>10.1f} {p95:>8.1f}")
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the per-step annotate latency.")
+    parser.add_argument('--nodes', type=int, default=5_000)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--browser', default='firefox', choices=['firefox', 'chromium', 'webkit'])
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.nodes, args.steps, args.browser))
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import statistics
+import time
+from playwright.async_api import async_playwright
+from src.modules.helper import read_file
+
+
+def build_synthetic_dom(num_nodes:int)->str:
+    """Builds a synthetic order-history-like page with roughly `num_nodes` elements.
+
+    Every card is a clickable container with nested clickable children, so the "innermost clickable" filter has real work to do. One card in ten is hidden, and most cards sit below the fold.
+
+    Args:
+        num_nodes (int): The approximate number of elements on the page.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    nodes_per_card = 10
+    cards = []
+    for i in range(max(1, num_nodes // nodes_per_card)):
+        hidden = ' style="display:none"' if i % 10 == 9 else ''
+        cards.append(
+            f'<div class="card" style="cursor:pointer;padding:8px;border:1px solid #ccc"{hidden}>'
+            f'<div class="row"><img alt="" width="40" height="40">'
+            f'<a href="#order-{i}"><span>Product {i}</span></a></div>'
+            f'<div class="row"><span>&#8377;{100 + i}</span><span>Delivered</span></div>'
+            f'<div class="row"><button>Rate {i}</button></div>'
+            f'</div>'
+        )
+    return f"<html><head></head><body>{''.join(cards)}</body></html>"
+
+
+async def benchmark(script_path:str, sizes:list, repeats:int, browser_name:str):
+    """Runs markPage() on synthetic DOMs of the given sizes and prints the timings.
+
+    Args:
+        script_path (str): The path to the mark page script to benchmark.
+        sizes (list): The DOM sizes (number of elements) to benchmark.
+        repeats (int): The number of timed runs per size.
+        browser_name (str): The playwright browser to use.
+    """
+    script = read_file(script_path)
+    async with async_playwright() as p:
+        browser = await getattr(p, browser_name).launch(headless=True)
+        page = await browser.new_page(viewport={'width':1280, 'height':800})
+        print(f"{'nodes':>8} {'bboxes':>7} {'median ms':>10} {'min ms':>8}")
+        for size in sizes:
+            await page.set_content(build_synthetic_dom(size))
+            await page.evaluate(script)
+            node_count = await page.evaluate("document.querySelectorAll('*').length")
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                bboxes = await page.evaluate("markPage()")
+                timings.append((time.perf_counter() - start) * 1000)
+                await page.evaluate("unmarkPage()")
+            print(f"{node_count:>8} {len(bboxes):>7} {statistics.median(timings):>10.1f} {min(timings):>8.1f}")
+        await browser.close()
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Benchmark markPage() on synthetic DOMs.")
+    parser.add_argument('--script', default="src/scripts/mark_page.js", help="Mark page script to benchmark. Use `git show <rev>:src/scripts/mark_page.js` to compare against an older version.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--browser', default='firefox', choices=['firefox', 'chromium', 'webkit'])
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.script, args.sizes, args.repeats, args.browser))
@@ -0,0 +1,145 @@
+import argparse
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+PRODUCTS = ["Wireless Earbuds", "Running Shoes", "Cotton T-Shirt", "Steel Water Bottle", "Phone Case", "Desk Lamp", "Backpack", "Notebook Pack"]
+STATUSES = ["Delivered on Mar 3", "Delivered on Jan 21", "Cancelled", "Refund Completed", "Shipped"]
+SENTINEL = "No More Results To Display"
+
+
+def order_card(i:int, complexity:int)->str:
+    """Builds the card of the i-th order, shaped like a Flipkart order card: a link to the order details page with the product name, the price and the delivery status. The name is wrapped in `complexity` extra levels of elements.
+
+    Args:
+        i (int): The index of the order.
+        complexity (int): The number of extra nesting levels.
+
+    Returns:
+        str: The HTML of the card.
+    """
+    name = f"{PRODUCTS[i % len(PRODUCTS)]} #{i}"
+    for _ in range(complexity):
+        name = f'<div class="wrap"><span class="inner">{name}</span></div>'
+    return (
+        f'<a class="card" href="/order_details?order_id={i}">'
+        f'<div class="row"><img alt="" width="60" height="60"><div class="name">{name}</div><div class="attr">Color: Black</div></div>'
+        f'<div class="price">&#8377;{100 + (i * 37) % 5000:,}</div>'
+        f'<div class="status">{STATUSES[i % len(STATUSES)]}</div>'
+        f'</a>'
+    )
+
+
+def orders_page(orders:int, page_size:int, complexity:int, popup:bool)->str:
+    """Builds the orders page with its first `page_size` orders. The next ones are fetched from /api/orders when the window is scrolled near the bottom, and the sentinel text is shown once all of them are loaded."""
+    cards = "".join(order_card(i, complexity) for i in range(min(orders, page_size)))
+    end = SENTINEL if orders <= page_size else ""
+    overlay = (
+        '<div id="popup" style="position:fixed;inset:0;background:#0008;display:flex;align-items:center;justify-content:center">'
+        '<div style="background:#fff;padding:24px"><p>Get 10% off in the app!</p>'
+        '<button aria-label="Close" onclick="document.getElementById(\'popup\').remove()">X</button></div></div>'
+    ) if popup else ""
+    return f"""<html><head><title>My Orders</title><style>
+.card {{ display:block; border:1px solid #ddd; margin:8px; padding:8px; color:inherit; text-decoration:none }}
+.row {{ display:flex; gap:8px }}
+</style></head><body>
+<header><a href="/">Home</a> <input aria-label="Search for products"> <a href="/account/orders">Orders</a></header>
+{overlay}
+<div id="orders">{cards}</div>
+<div id="end">{end}</div>
+<script>
+let offset = {page_size}, loading = false;
+window.addEventListener("scroll", async () => {{
+  if (loading || offset >= {orders}) return;
+  if (window.innerHeight + window.scrollY < document.body.scrollHeight - 800) return;
+  loading = true;
+  const response = await fetch("/api/orders?offset=" + offset);
+  document.getElementById("orders").insertAdjacentHTML("beforeend", await response.text());
+  offset += {page_size};
+  loading = false;
+  if (offset >= {orders}) document.getElementById("end").textContent = "{SENTINEL}";
+}});
+</script></body></html>"""
+
+
+def order_details_page(i:int)->str:
+    """Builds the order details page of the i-th order, with the order date, the seller and the number of items."""
+    return (
+        f"<html><body><h1>{PRODUCTS[i % len(PRODUCTS)]} #{i}</h1>"
+        f"<div>Ordered on Mar {1 + i % 28}, 2024</div><div>Seller: Shop {i % 7}</div><div>1 item</div></body></html>"
+    )
+
+
+class StorefrontHandler(BaseHTTPRequestHandler):
+    """Serves the mock storefront. The settings are read from the server."""
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if server.latency:
+            time.sleep(server.latency)
+        if url.path in ("/", "/account/orders"):
+            body = orders_page(server.orders, server.page_size, server.complexity, server.popup)
+        elif url.path == "/api/orders":
+            offset = int(query.get("offset", ["0"])[0])
+            body = "".join(order_card(i, server.complexity) for i in range(offset, min(server.orders, offset + server.page_size)))
+        elif url.path == "/order_details":
+            body = order_details_page(int(query.get("order_id", ["0"])[0]))
+        else:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_storefront(orders:int, page_size:int=20, complexity:int=3, popup:bool=True, latency:float=0.0, port:int=0)->ThreadingHTTPServer:
+    """Starts the mock storefront in a background thread. Stop it with `server.shutdown()`.
+
+    Args:
+        orders (int): The number of orders in the order history.
+        page_size (int, optional): The number of orders loaded per scroll. Defaults to 20.
+        complexity (int, optional): The number of extra nesting levels in every order card. Defaults to 3.
+        popup (bool, optional): If true, the orders page opens with a popup which has to be closed. Defaults to True.
+        latency (float, optional): The delay of every response in seconds. Defaults to 0.
+        port (int, optional): The port to listen on. Defaults to 0, for a free port.
+
+    Returns:
+        ThreadingHTTPServer: The server, with its base url in `server.url`.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StorefrontHandler)
+    server.daemon_threads = True
+    server.orders = orders
+    server.page_size = page_size
+    server.complexity = complexity
+    server.popup = popup
+    server.latency = latency
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Serves a mock Flipkart-like storefront with an infinitely scrolling orders page.")
+    parser.add_argument('--orders', type=int, default=100)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--complexity', type=int, default=3)
+    parser.add_argument('--no-popup', action='store_true')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+    server = start_storefront(args.orders, args.page_size, args.complexity, not args.no_popup, args.latency, args.port)
+    print(f"Orders page at {server.url}/account/orders")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
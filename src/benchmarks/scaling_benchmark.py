@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from playwright.async_api import async_playwright, Page
+from src.modules.graph import get_graph
+from src.modules.helper import install_mark_page, read_resource
+from src.modules.store import OrderStore
+from src.modules.tracing import Tracer
+from src.benchmarks.mock_storefront import start_storefront, SENTINEL
+
+
+CLOSE_PATTERN = re.compile(r'^(\d+)[\d, -]* \(<\w+/>\): "Close"', re.MULTILINE)
+
+
+class ScriptedModel:
+    """Stands in for the llm with a fixed policy, so that the benchmark measures the bot and not the model. It closes the popup, loads all the orders with the given strategy, saves them and completes the task.
+
+    With the 'scroll_to_end' strategy, all the orders are loaded with one scroll_to_end call. With the 'scroll' strategy, the orders are extracted after every scroll of the window, until the sentinel text is on the page."""
+
+    def __init__(self, page:Page, strategy:str, max_scrolls:int):
+        self.page = page
+        self.strategy = strategy
+        self.max_scrolls = max_scrolls
+        self.last = None
+
+    async def decide(self, prompt_value)->AIMessage:
+        content = prompt_value.to_messages()[-1].content
+        text = content if isinstance(content, str) else " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        close = CLOSE_PATTERN.search(text)
+        if close and self.last != "click":
+            action = "click"
+        elif self.last == "OutputOrders":
+            action = "CompleteTask"
+        elif self.strategy == "scroll_to_end":
+            action = "OutputOrders" if self.last == "scroll_to_end" else "scroll_to_end"
+        elif self.last != "extract_orders":
+            action = "extract_orders"
+        elif await self.page.evaluate(f"document.body.innerText.includes({json.dumps(SENTINEL)})"):
+            action = "OutputOrders"
+        else:
+            action = "scroll"
+        self.last = action
+        arguments = {
+            "click": {"bbox_id": int(close.group(1))} if close else {},
+            "CompleteTask": {"answer": "COMPLETED"},
+            "scroll_to_end": {"max_scrolls": self.max_scrolls},
+            "scroll": {"target": "WINDOW", "direction": "down"},
+            "extract_orders": {},
+            "OutputOrders": {"orders": []},
+        }[action]
+        return AIMessage(content=f"Thought: calling {action}.", additional_kwargs={"function_call": {"name": action, "arguments": json.dumps(arguments)}})
+
+
+async def run(browser, graph, orders:int, strategy:str, page_size:int, complexity:int, popup:bool)->dict:
+    """Runs the graph with the scripted model against a mock storefront with the given number of orders.
+
+    Returns:
+        dict: The number of agent steps, the wall time and the total annotate time in seconds, and the number of orders in the store.
+    """
+    server = start_storefront(orders, page_size=page_size, complexity=complexity, popup=popup)
+    context = await browser.new_context(viewport={'width':1280, 'height':800})
+    await install_mark_page(context)
+    page = await context.new_page()
+    await page.goto(f"{server.url}/account/orders")
+    model = ScriptedModel(page, strategy, max_scrolls=orders // page_size + 10)
+    tracer = Tracer()
+    workdir = tempfile.mkdtemp()
+    steps = 0
+    start = time.perf_counter()
+    try:
+        async for event in graph.astream(
+            input={'page':page, 'input':read_resource("prompts/user_prompt.txt"), 'scratchpad':[], 'order_store':os.path.join(workdir, "orders.db"), 'orders_export':os.path.join(workdir, "orders.json")},
+            config={'recursion_limit':100_000, 'configurable':{'llm':RunnableLambda(model.decide, name="scripted_model")}, 'callbacks':[tracer]},
+        ):
+            steps += int("agent" in event)
+    finally:
+        wall_time = time.perf_counter() - start
+        await context.close()
+        server.shutdown()
+    annotate_time = sum(span["duration"] for span in tracer.spans if span["name"] == "annotate")
+    return {"orders": orders, "steps": steps, "wall_time": wall_time, "annotate_time": annotate_time, "saved": len(OrderStore(os.path.join(workdir, "orders.db")))}
+
+
+def bar_chart(title:str, rows:list, unit:str, width:int=50):
+    """Prints a horizontal ASCII bar chart of (label, value) rows."""
+    print(f"\n{title}")
+    peak = max(value for _, value in rows) or 1
+    for label, value in rows:
+        value_text = f"{value:.2f}" if isinstance(value, float) else str(value)
+        print(f"{label:>8} | {'#' * max(1, round(value / peak * width)):<{width}} {value_text}{unit}")
+
+
+async def benchmark(sizes:list, strategy:str, page_size:int, complexity:int, popup:bool, browser_name:str):
+    """Prints the steps, the wall time and the annotate time of full runs against mock storefronts of the given sizes. Fails if a run did not save every order of its storefront.
+
+    Args:
+        sizes (list): The numbers of orders to benchmark.
+        strategy (str): The scrolling strategy of the scripted model, 'scroll_to_end' or 'scroll'.
+        page_size (int): The number of orders loaded per scroll.
+        complexity (int): The number of extra nesting levels in every order card.
+        popup (bool): If true, the orders page opens with a popup.
+        browser_name (str): The playwright browser to use.
+    """
+    graph = get_graph()
+    results = []
+    async with async_playwright() as p:
+        browser = await getattr(p, browser_name).launch(headless=True)
+        print(f"{'orders':>8} {'saved':>7} {'steps':>6} {'wall s':>8} {'annotate s':>11}")
+        for size in sizes:
+            result = await run(browser, graph, size, strategy, page_size, complexity, popup)
+            results.append(result)
+            print(f"{result['orders']:>8} {result['saved']:>7} {result['steps']:>6} {result['wall_time']:>8.2f} {result['annotate_time']:>11.2f}")
+            if result['saved'] != size:
+                raise AssertionError(f"Only {result['saved']} of the {size} orders were saved with the {strategy} strategy.")
+        await browser.close()
+    bar_chart("Agent steps", [(str(r["orders"]), r["steps"]) for r in results], "")
+    bar_chart("Wall time", [(str(r["orders"]), r["wall_time"]) for r in results], "s")
+    bar_chart("Annotate time", [(str(r["orders"]), r["annotate_time"]) for r in results], "s")
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Benchmark how full runs scale with the size of the order history, on a mock storefront with a scripted model.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1_000, 10_000])
+    parser.add_argument('--strategy', default='scroll_to_end', choices=['scroll_to_end', 'scroll'])
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--complexity', type=int, default=3)
+    parser.add_argument('--no-popup', action='store_true')
+    parser.add_argument('--browser', default='firefox', choices=['firefox', 'chromium', 'webkit'])
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.sizes, args.strategy, args.page_size, args.complexity, not args.no_popup, args.browser))
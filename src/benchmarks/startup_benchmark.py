@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import aclosing
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[2]
+MODULES = ["src.modules.struct", "src.modules.helper", "src.modules.runnables", "src.modules.graph", "app"]
+
+
+def import_time(module:str)->float:
+    """Imports the module in a fresh interpreter and returns the import time in milliseconds."""
+    code = f"import time; start = time.perf_counter(); import {module}; print((time.perf_counter() - start) * 1000)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+async def first_step(browser_name:str|None)->dict:
+    """Times the startup phases of a fresh process, up to the first decision of the agent on a mock storefront. The decision comes from the scripted model of the scaling benchmark, so the time of the llm call itself is left out. The llm client is only created if OPENAI_API_KEY is set.
+
+    Args:
+        browser_name (str|None): The playwright browser to run the first step in, or None to stop after building the graph.
+
+    Returns:
+        dict: The time of every phase in milliseconds.
+    """
+    timings = {}
+    start = time.perf_counter()
+    from src.modules.graph import get_graph
+    timings["import"] = (time.perf_counter() - start) * 1000
+
+    phase = time.perf_counter()
+    graph = get_graph()
+    timings["build_graph"] = (time.perf_counter() - phase) * 1000
+
+    if os.environ.get("OPENAI_API_KEY"):
+        phase = time.perf_counter()
+        from src.modules.runnables import get_llm
+        get_llm()
+        timings["llm_client"] = (time.perf_counter() - phase) * 1000
+
+    if browser_name is not None:
+        from langchain_core.runnables import RunnableLambda
+        from playwright.async_api import async_playwright
+        from src.modules.helper import install_mark_page, read_resource
+        from src.benchmarks.mock_storefront import start_storefront
+        from src.benchmarks.scaling_benchmark import ScriptedModel
+
+        server = start_storefront(20, popup=False)
+        async with async_playwright() as p:
+            phase = time.perf_counter()
+            browser = await getattr(p, browser_name).launch(headless=True)
+            context = await browser.new_context(viewport={'width':1280, 'height':800})
+            await install_mark_page(context)
+            page = await context.new_page()
+            await page.goto(f"{server.url}/account/orders")
+            timings["browser"] = (time.perf_counter() - phase) * 1000
+
+            phase = time.perf_counter()
+            model = ScriptedModel(page, "scroll_to_end", max_scrolls=10)
+            events = graph.astream(
+                input={'page':page, 'input':read_resource("prompts/user_prompt.txt"), 'scratchpad':[]},
+                config={'configurable':{'llm':RunnableLambda(model.decide, name="scripted_model")}},
+            )
+            async with aclosing(events) as stream:
+                async for event in stream:
+                    if "agent" in event:
+                        break
+            timings["first_step"] = (time.perf_counter() - phase) * 1000
+            await browser.close()
+        server.shutdown()
+
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def run_first_step(browser_name:str|None)->dict:
+    """Runs first_step in a fresh interpreter, and adds the wall time of the whole process in milliseconds."""
+    command = [sys.executable, "-m", "src.benchmarks.startup_benchmark", "--child"]
+    command += ["--browser", browser_name] if browser_name is not None else ["--no-browser"]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    process = (time.perf_counter() - start) * 1000
+    return {**json.loads(result.stdout.strip().splitlines()[-1]), "process": process}
+
+
+def benchmark(runs:int, browser_name:str|None):
+    """Prints the median and the minimum import time of the main modules, and of the startup phases up to the first agent step, over fresh interpreters.
+
+    Args:
+        runs (int): The number of fresh interpreters per measurement.
+        browser_name (str|None): The playwright browser for the first step, or None to skip the browser.
+    """
+    print(f"{'import':<24} {'median ms':>10} {'min ms':>8}")
+    for module in MODULES:
+        timings = [import_time(module) for _ in range(runs)]
+        print(f"{module:<24} {statistics.median(timings):>10.1f} {min(timings):>8.1f}")
+
+    results = [run_first_step(browser_name) for _ in range(runs)]
+    print(f"\n{'phase':<24} {'median ms':>10} {'min ms':>8}")
+    for phase in results[0]:
+        timings = [result[phase] for result in results]
+        print(f"{phase:<24} {statistics.median(timings):>10.1f} {min(timings):>8.1f}")
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the modules and the time to the first agent step, in fresh interpreters.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--browser', default='firefox', choices=['firefox', 'chromium', 'webkit'])
+    parser.add_argument('--no-browser', action='store_true', help="Stop after building the graph, without a browser.")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    browser_name = None if args.no_browser else args.browser
+    if args.child:
+        print(json.dumps(asyncio.run(first_step(browser_name))))
+    else:
+        benchmark(args.runs, browser_name)
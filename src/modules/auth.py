@@ -0,0 +1,92 @@
+from typing import Optional
+import json
+import os
+import time
+from playwright.async_api import Browser, BrowserContext, Page
+
+
+FLIPKART_ORDERS_URL = "https://www.flipkart.com/account/orders"
+LOGIN_URL_MARKER = "/account/login"
+
+
+def storage_state_expired(path:str, domain:str="flipkart.com", now:Optional[float]=None)->bool:
+    """Checks whether the saved login state is missing or expired, without opening a browser. The state counts as expired if it has no cookies for the domain which are still valid. Short lived tracking cookies expire long before the login, so a state with some expired cookies is still restored, and `open_logged_in` checks whether the site accepts it.
+
+    Args:
+        path (str): The path to the storage state file saved by `save_storage_state`.
+        domain (str, optional): The domain the login is for. Defaults to 'flipkart.com'.
+        now (Optional[float], optional): The current unix time. Defaults to the time of the call.
+
+    Returns:
+        bool: True if the state cannot be used.
+    """
+    if not os.path.exists(path):
+        return True
+    try:
+        with open(path) as f:
+            cookies = json.load(f).get("cookies", [])
+    except (OSError, ValueError):
+        return True
+    now = time.time() if now is None else now
+    cookies = [cookie for cookie in cookies if cookie.get("domain", "").lstrip(".").endswith(domain)]
+    return all(0 < cookie.get("expires", -1) < now for cookie in cookies)
+
+
+async def new_context(browser: Browser, storage_state_path:Optional[str]=None, **kwargs)->tuple:
+    """Creates a browser context, restoring the saved login state if there is a usable one.
+
+    Args:
+        browser (Browser): The browser to create the context in.
+        storage_state_path (Optional[str], optional): The path to the saved storage state. Defaults to None, for a fresh context.
+        **kwargs: Additional arguments for `browser.new_context`.
+
+    Returns:
+        tuple: The BrowserContext and whether the login state was restored.
+    """
+    if storage_state_path and not storage_state_expired(storage_state_path):
+        return await browser.new_context(storage_state=storage_state_path, **kwargs), True
+    return await browser.new_context(**kwargs), False
+
+
+async def open_logged_in(page: Page, url:str=FLIPKART_ORDERS_URL)->bool:
+    """Opens the given page and checks that the restored login is still accepted by the site, which redirects to the login page otherwise.
+
+    Args:
+        page (Page): The page to open the url in.
+        url (str, optional): The url which needs a login. Defaults to the Flipkart orders page.
+
+    Returns:
+        bool: True if the page was opened while logged in.
+    """
+    await page.goto(url)
+    return LOGIN_URL_MARKER not in page.url
+
+
+async def confirm_login(context: BrowserContext, url:str=FLIPKART_ORDERS_URL)->bool:
+    """Checks in a new page of the context whether the site accepts its login, before the login state is saved.
+
+    Args:
+        context (BrowserContext): The context to check.
+        url (str, optional): The url which needs a login. Defaults to the Flipkart orders page.
+
+    Returns:
+        bool: True if the url opened while logged in.
+    """
+    page = await context.new_page()
+    try:
+        return await open_logged_in(page, url)
+    finally:
+        await page.close()
+
+
+async def save_storage_state(context: BrowserContext, path:str):
+    """Saves the cookies and the local storage of the context, to restore the login in later runs.
+
+    Args:
+        context (BrowserContext): The context to save.
+        path (str): The path to save the storage state at.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    await context.storage_state(path=path)
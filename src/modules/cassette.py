@@ -0,0 +1,110 @@
+from typing import Literal
+import hashlib
+import json
+import os
+from langchain_core.messages import AIMessage, messages_to_dict, messages_from_dict
+from langchain_core.prompt_values import PromptValue
+from playwright.async_api import BrowserContext
+
+
+def prompt_hash(prompt_value:PromptValue)->str:
+    """Hashes the text of a prompt. Images are left out, since screenshots of the same page are never byte for byte identical.
+
+    Args:
+        prompt_value (PromptValue): The formatted prompt.
+
+    Returns:
+        str: The hex digest.
+    """
+    texts = []
+    for message in prompt_value.to_messages():
+        if isinstance(message.content, str):
+            texts.append(message.content)
+        else:
+            texts.extend(part.get("text", "") for part in message.content if isinstance(part, dict))
+    return hashlib.sha256("\n".join(texts).encode()).hexdigest()
+
+
+class Cassette:
+    """Records the llm responses, the user responses and the network traffic of a run into a directory, and serves them back in a later run without any network access.
+
+    The llm and user responses are replayed in the order they were recorded. The prompt hash of every llm call is checked, and a mismatch is counted in `mismatches` instead of failing, since tool outputs carry timings. The network traffic is recorded and replayed as a HAR file through Playwright's routing, and requests missing from it are aborted in replay mode."""
+
+    def __init__(self, directory:str, mode:Literal['record','replay']):
+        self.directory = directory
+        self.mode = mode
+        self.llm_path = os.path.join(directory, "llm.jsonl")
+        self.user_path = os.path.join(directory, "user.jsonl")
+        self.har_path = os.path.join(directory, "network.har")
+        self.mismatches = 0
+        if mode == "record":
+            os.makedirs(directory, exist_ok=True)
+            for path in (self.llm_path, self.user_path):
+                open(path, "w").close()
+        else:
+            self.llm_entries = self.load(self.llm_path)
+            self.user_entries = self.load(self.user_path)
+
+    @staticmethod
+    def load(path:str)->list:
+        """Loads the entries of a JSON lines file."""
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    @staticmethod
+    def append(path:str, entry:dict):
+        """Appends an entry to a JSON lines file, so that a crashed run keeps what it recorded."""
+        with open(path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    async def attach(self, context:BrowserContext):
+        """Routes the network traffic of the context through the HAR file of the cassette. In record mode, the HAR file is written when the context is closed.
+
+        Args:
+            context (BrowserContext): The browser context.
+        """
+        await context.route_from_har(
+            self.har_path,
+            update=self.mode == "record",
+            update_content="embed",
+            not_found="abort",
+        )
+
+    def record_llm(self, prompt_value:PromptValue, response:AIMessage):
+        """Records one llm call."""
+        self.append(self.llm_path, {"prompt_hash": prompt_hash(prompt_value), "response": messages_to_dict([response])[0]})
+
+    def replay_llm(self, prompt_value:PromptValue)->AIMessage:
+        """Returns the next recorded llm response.
+
+        Args:
+            prompt_value (PromptValue): The formatted prompt, to check against the recorded one.
+
+        Raises:
+            LookupError: If all the recorded responses were used up.
+
+        Returns:
+            AIMessage: The recorded response.
+        """
+        if not self.llm_entries:
+            raise LookupError(f"No more recorded llm responses in {self.llm_path}")
+        entry = self.llm_entries.pop(0)
+        if entry["prompt_hash"] != prompt_hash(prompt_value):
+            self.mismatches += 1
+        return messages_from_dict([entry["response"]])[0]
+
+    def record_user(self, response:str):
+        """Records one response of the user to to_user."""
+        self.append(self.user_path, {"response": response})
+
+    def replay_user(self)->str:
+        """Returns the next recorded response of the user.
+
+        Raises:
+            LookupError: If all the recorded responses were used up.
+        """
+        if not self.user_entries:
+            raise LookupError(f"No more recorded user responses in {self.user_path}")
+        return self.user_entries.pop(0)["response"]
@@ -0,0 +1,103 @@
+from typing import Sequence, Optional
+from io import BytesIO
+import base64
+import hashlib
+import json
+from PIL import Image
+from src.modules.struct import BBox
+
+
+def dhash(img:str, hash_size:int=8)->int:
+    """Computes the difference hash of a base64 encoded image. Similar looking images have hashes with a small hamming distance, so that small rendering differences do not register as a change.
+
+    Args:
+        img (str): The base64 encoded image.
+        hash_size (int, optional): The hash has hash_size*hash_size bits. Defaults to 8.
+
+    Returns:
+        int: The difference hash.
+    """
+    image = Image.open(BytesIO(base64.b64decode(img))).convert("L")
+    image = image.resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def bboxes_digest(bboxes:Sequence[BBox])->str:
+    """Computes a digest of the bounding boxes, covering their position, type and text.
+
+    Args:
+        bboxes (Sequence[BBox]): The list of bounding boxes on the page.
+
+    Returns:
+        str: The hex digest.
+    """
+    payload = json.dumps(
+        [[round(bbox["x"]), round(bbox["y"]), bbox["type"], bbox["text"], bbox["ariaLabel"]] for bbox in bboxes]
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def page_signature(img:str, bboxes:Sequence[BBox])->str:
+    """Computes the signature of an observation, made of the perceptual hash of the screenshot and the digest of the bounding boxes.
+
+    Args:
+        img (str): The base64 encoded screenshot.
+        bboxes (Sequence[BBox]): The list of bounding boxes on the page.
+
+    Returns:
+        str: The signature, as '<dhash>:<bboxes digest>'.
+    """
+    return f"{dhash(img):016x}:{bboxes_digest(bboxes)}"
+
+
+def is_same_page(previous:Optional[str], current:str, max_distance:int=4)->bool:
+    """Compares two page signatures. The pages are the same if the bounding boxes are identical and the screenshot hashes differ by at most max_distance bits.
+
+    Args:
+        previous (Optional[str]): The signature of the previous observation. None if there was none.
+        current (str): The signature of the current observation.
+        max_distance (int, optional): The maximum hamming distance between the screenshot hashes. Defaults to 4.
+
+    Returns:
+        bool: True if the page has not changed.
+    """
+    if not previous:
+        return False
+    previous_hash, previous_digest = previous.split(":")
+    current_hash, current_digest = current.split(":")
+    distance = bin(int(previous_hash, 16) ^ int(current_hash, 16)).count("1")
+    return previous_digest == current_digest and distance <= max_distance
+
+
+class ChangeStats:
+    """Counts how often the observed page was unchanged, and what that saved"""
+
+    def __init__(self):
+        self.observations = 0
+        self.unchanged = 0
+        self.calls_saved = 0
+        self.images_saved = 0
+
+    def record(self, unchanged:bool):
+        """Records one observation."""
+        self.observations += 1
+        self.unchanged += int(unchanged)
+
+    @property
+    def hit_rate(self)->float:
+        """The fraction of observations where the page was unchanged."""
+        return self.unchanged / self.observations if self.observations else 0.0
+
+    def __str__(self)->str:
+        return (
+            f"{self.unchanged}/{self.observations} unchanged observations ({self.hit_rate:.0%}), "
+            f"{self.calls_saved} model calls saved, {self.images_saved} screenshots not re-sent"
+        )
+
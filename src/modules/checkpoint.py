@@ -0,0 +1,133 @@
+import json
+import os
+from langchain_core.messages import messages_to_dict, messages_from_dict
+from langchain_core.pydantic_v1 import BaseModel
+from playwright.async_api import Page
+from src.modules.struct import AgentState
+from src.modules.functions import agent_router
+from src.modules.helper import settle
+
+
+# The state keys which are not saved. The page is restored from the url and the scroll position instead.
+SKIPPED_KEYS = ('page', 'resume_node')
+# The keys of the observation of the page, which the agent node builds again when it runs.
+OBSERVATION_KEYS = ('img', 'img_mime', 'img_bytes', 'bboxes', 'previous_bboxes')
+# The tool nodes which act on the bounding boxes of the last observation, so they are kept when one of them is due next.
+BBOX_NODES = ('click', 'type_text', 'scroll')
+
+
+def next_node(node:str, state:AgentState)->str:
+    """Returns the node the graph runs after the given node has completed, following the edges of the flipkart scraper graph.
+
+    Args:
+        node (str): The name of the completed node.
+        state (AgentState): The state after the node.
+
+    Returns:
+        str: The name of the next node, or '__end__' if the run is complete.
+    """
+    if node == 'agent':
+        return agent_router(state)
+    if node == 'update_scratchpad':
+        return 'agent'
+    return 'update_scratchpad'
+
+
+def serialize_state(state:AgentState, resume_at:str='agent')->dict:
+    """Converts the state into JSON serializable values. The messages are converted with messages_to_dict and the configs with their dict method. The observation of the page is left out, except for the bounding boxes when a tool which acts on them is due next.
+
+    Args:
+        state (AgentState): The state to convert.
+        resume_at (str, optional): The node the graph runs next. Defaults to 'agent'.
+
+    Returns:
+        dict: The serializable state.
+    """
+    skipped = SKIPPED_KEYS + tuple(key for key in OBSERVATION_KEYS if key != 'bboxes' or resume_at not in BBOX_NODES)
+    serialized = {}
+    for key, value in state.items():
+        if key in skipped:
+            continue
+        if key == 'scratchpad':
+            value = messages_to_dict(value)
+        elif isinstance(value, BaseModel):
+            value = value.dict()
+        serialized[key] = value
+    return serialized
+
+
+def deserialize_state(serialized:dict)->dict:
+    """Converts the values saved by serialize_state back into the state, using the annotations of AgentState to rebuild the configs."""
+    state = {}
+    for key, value in serialized.items():
+        annotation = AgentState.__annotations__.get(key)
+        if key == 'scratchpad':
+            value = messages_from_dict(value)
+        elif isinstance(annotation, type) and issubclass(annotation, BaseModel) and value is not None:
+            value = annotation(**value)
+        state[key] = value
+    return state
+
+
+class Checkpointer:
+    """Saves the state of a run to a JSON file after every completed graph node, so that a run which crashed, was rate limited or hit the recursion limit can be resumed where it stopped.
+
+    Everything in the state except the page and the observation of the page is saved, with the node to run next, and the url and the scroll position of the page. A run resumed from the file first restores the page, and then enters the graph at the saved node. The checkpoint of a complete run is not resumed."""
+
+    def __init__(self, path:str="checkpoint.json"):
+        self.path = path
+
+    async def save(self, state:AgentState, node:str, page:Page):
+        """Saves the state after a completed node. The file is replaced atomically, so a crash while saving keeps the previous checkpoint.
+
+        Args:
+            state (AgentState): The state after the node.
+            node (str): The name of the completed node.
+            page (Page): The page of the run.
+        """
+        scroll = await page.evaluate("() => [window.scrollX, window.scrollY]")
+        resume_at = next_node(node, state)
+        checkpoint = {
+            'next': resume_at,
+            'url': page.url,
+            'scroll': scroll,
+            'state': serialize_state(state, resume_at),
+        }
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    def load(self)->dict|None:
+        """Loads the checkpoint to resume from.
+
+        Returns:
+            dict|None: The checkpoint with the restored state, or None if there is no checkpoint or its run was complete.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            checkpoint = json.load(f)
+        if checkpoint['next'] == '__end__':
+            return None
+        return {**checkpoint, 'state': deserialize_state(checkpoint['state'])}
+
+    async def restore_page(self, page:Page, checkpoint:dict, max_scrolls:int=50):
+        """Navigates the page back to the url of the checkpoint and scrolls it to the saved position. On pages with infinite scrolling, it scrolls in steps until the content up to the position is loaded again.
+
+        Args:
+            page (Page): The page to restore.
+            checkpoint (dict): The checkpoint.
+            max_scrolls (int, optional): The maximum number of scroll steps. Defaults to 50.
+        """
+        if page.url != checkpoint['url']:
+            await page.goto(checkpoint['url'])
+            await settle(page)
+        x, y = checkpoint['scroll']
+        reached = -1
+        for _ in range(max_scrolls):
+            await page.evaluate("([x, y]) => window.scrollTo(x, y)", [x, y])
+            await settle(page)
+            position = await page.evaluate("() => window.scrollY")
+            if position >= y - 1 or position <= reached:
+                break
+            reached = position
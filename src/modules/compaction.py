@@ -0,0 +1,131 @@
+from typing import Sequence
+from langchain_core.messages import BaseMessage, AIMessage, SystemMessage
+from src.modules.struct import CompactionConfig
+
+
+def estimate_tokens(text:str)->int:
+    """Estimates the number of tokens in a text, at roughly 4 characters per token.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return len(text) // 4 + 1
+
+
+def message_text(message:BaseMessage)->str:
+    """Returns the text of a message, including the function call if there is one.
+
+    Args:
+        message (BaseMessage): The message.
+
+    Returns:
+        str: The text of the message.
+    """
+    if isinstance(message.content, str):
+        text = message.content
+    else:
+        text = " ".join(part.get("text", "") for part in message.content if isinstance(part, dict))
+    function_call = message.additional_kwargs.get("function_call")
+    if function_call:
+        text += f"\n{function_call['name']}({function_call['arguments']})"
+    return text
+
+
+def message_tokens(message:BaseMessage)->int:
+    """Estimates the number of tokens of a message.
+
+    Args:
+        message (BaseMessage): The message.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return estimate_tokens(message_text(message))
+
+
+def shorten(text:str, max_chars:int)->str:
+    """Collapses the whitespace of a text and truncates it to max_chars characters."""
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+
+def fold_messages(messages:Sequence[BaseMessage], summary:dict, config:CompactionConfig)->dict:
+    """Folds messages into the rolling summary. Every function call becomes one line of the action log, with a shortened tool output. The content of the latest AI message is kept as the agent's notes, since that is where the agent keeps the list of orders seen so far.
+
+    Args:
+        messages (Sequence[BaseMessage]): The messages to fold, in order.
+        summary (dict): The current summary, with keys 'actions' (list of str), 'omitted' (int) and 'notes' (str).
+        config (CompactionConfig): The compaction config.
+
+    Returns:
+        dict: The updated summary.
+    """
+    actions = list(summary.get("actions", []))
+    omitted = summary.get("omitted", 0)
+    notes = summary.get("notes", "")
+    for message in messages:
+        if isinstance(message, AIMessage):
+            function_call = message.additional_kwargs.get("function_call")
+            if function_call:
+                actions.append(shorten(f"{function_call['name']}({function_call['arguments']})", config.line_chars))
+            if isinstance(message.content, str) and message.content.strip():
+                notes = message.content.strip()
+        elif actions:
+            actions[-1] = shorten(f"{actions[-1]} -> {message_text(message)}", config.line_chars)
+    if len(actions) > config.max_actions:
+        omitted += len(actions) - config.max_actions
+        actions = actions[-config.max_actions:]
+    return {"actions": actions, "omitted": omitted, "notes": notes}
+
+
+def summary_message(summary:dict)->SystemMessage:
+    """Renders the rolling summary as a message for the prompt.
+
+    Args:
+        summary (dict): The summary, as returned by `fold_messages`.
+
+    Returns:
+        SystemMessage: The summary message.
+    """
+    lines = ["Summary of your earlier steps, which are not shown in full any more."]
+    if summary.get("omitted"):
+        lines.append(f"({summary['omitted']} earlier actions omitted)")
+    lines.extend(f"- {action}" for action in summary.get("actions", []))
+    if summary.get("notes"):
+        lines.append(f"Your notes from the latest summarized step:\n{summary['notes']}")
+    return SystemMessage(content="\n".join(lines))
+
+
+def compact(scratchpad:Sequence[BaseMessage], summary:dict, summarized:int, config:CompactionConfig)->tuple:
+    """Compacts the scratchpad to fit the token budget. The most recent turns are kept verbatim, starting at an AI message, and everything before them is folded into the rolling summary. Messages which are already folded are never unfolded, so the summary only grows incrementally.
+
+    Args:
+        scratchpad (Sequence[BaseMessage]): The full scratchpad.
+        summary (dict): The rolling summary so far.
+        summarized (int): The number of scratchpad messages already folded into the summary.
+        config (CompactionConfig): The compaction config.
+
+    Returns:
+        tuple: The messages to send to the model, the updated summary and the updated number of folded messages.
+    """
+    cut = len(scratchpad)
+    used = estimate_tokens(summary_message(summary).content) if summarized else 0
+    while cut > summarized:
+        tokens = message_tokens(scratchpad[cut - 1])
+        if len(scratchpad) - cut >= config.keep_recent and used + tokens > config.token_budget:
+            break
+        used += tokens
+        cut -= 1
+    while cut < len(scratchpad) and not isinstance(scratchpad[cut], AIMessage):
+        cut += 1
+
+    if cut > summarized:
+        summary = fold_messages(scratchpad[summarized:cut], summary, config)
+        summarized = cut
+    messages = list(scratchpad[summarized:])
+    if summarized:
+        messages.insert(0, summary_message(summary))
+    return messages, summary, summarized
@@ -0,0 +1,115 @@
+from typing import Sequence
+import re
+from src.modules.struct import BBox, DescriptionConfig
+from src.modules.compaction import estimate_tokens
+
+
+DIGITS = re.compile(r"\d+")
+
+
+def bbox_label(bbox:BBox)->str:
+    """Returns the aria label of a bounding box, or its text if it has none, with the whitespace collapsed."""
+    text = bbox.get("ariaLabel", "")
+    if not text.strip():
+        text = bbox.get("text", "")
+    return " ".join(text.split())
+
+
+def truncate(text:str, max_chars:int)->str:
+    """Cuts a text to max_chars characters, marking the cut with an ellipsis."""
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+def format_ids(ids:Sequence[int])->str:
+    """Formats a list of IDs, writing consecutive runs as ranges, like '3-6, 9'."""
+    parts = []
+    start = previous = ids[0]
+    for i in list(ids[1:]) + [None]:
+        if i is not None and i == previous + 1:
+            previous = i
+            continue
+        parts.append(str(start) if start == previous else f"{start}-{previous}")
+        start = previous = i
+    return ", ".join(parts)
+
+
+def full_descriptions(bboxes:Sequence[BBox])->str:
+    """Describes every bounding box with its full label, one per line."""
+    labels = [f'{i} (<{bbox.get("type", "")}/>): "{bbox_label(bbox)}"' for i, bbox in enumerate(bboxes)]
+    return "Valid Bounding Boxes:\n" + "\n".join(labels)
+
+
+def is_unchanged(i:int, bbox:BBox, previous:Sequence[BBox], tolerance:float)->bool:
+    """Whether the bounding box had the same ID, type, label and position in the previous observation."""
+    if i >= len(previous):
+        return False
+    other = previous[i]
+    return (
+        bbox.get("type") == other.get("type")
+        and bbox_label(bbox) == bbox_label(other)
+        and abs(bbox["x"] - other["x"]) <= tolerance
+        and abs(bbox["y"] - other["y"]) <= tolerance
+    )
+
+
+def encode_descriptions(bboxes:Sequence[BBox], previous:Sequence[BBox]|None, config:DescriptionConfig)->tuple:
+    """Describes the bounding boxes compactly. Labels are truncated to `max_chars`. With `dedupe`, boxes with the same type and label share one line, and runs of consecutive boxes which only differ in their numbers, like the stars of a rating, are collapsed into one line. With `delta`, the boxes which are unchanged since the previous observation are only listed by ID with a short label, and the new or moved ones are described in full.
+
+    Args:
+        bboxes (Sequence[BBox]): The list of bounding boxes on the page.
+        previous (Sequence[BBox] | None): The list of bounding boxes of the previous observation.
+        config (DescriptionConfig): The description config.
+
+    Returns:
+        tuple: The descriptions, and the estimated number of tokens saved compared to the full descriptions.
+    """
+    full = full_descriptions(bboxes)
+    unchanged = []
+    described = []
+    for i, bbox in enumerate(bboxes):
+        if config.delta and previous and is_unchanged(i, bbox, previous, config.move_tolerance):
+            unchanged.append(i)
+        else:
+            described.append(i)
+
+    lines = []
+    if config.dedupe:
+        groups = {}
+        runs = []
+        for i in described:
+            label = truncate(bbox_label(bboxes[i]), config.max_chars)
+            key = (bboxes[i].get("type", ""), label)
+            if key in groups:
+                groups[key].append(i)
+                continue
+            groups[key] = [i]
+            shape = (key[0], DIGITS.sub("#", label))
+            run = runs[-1] if runs else None
+            if run and run["shape"] == shape and run["ids"][-1] == i - 1:
+                run["ids"].append(i)
+                run["last"] = label
+            else:
+                runs.append({"shape": shape, "key": key, "ids": [i], "last": label})
+        for run in runs:
+            el_type, label = run["key"]
+            if len(run["ids"]) >= config.min_repeat:
+                lines.append((run["ids"][0], f'{format_ids(run["ids"])} (<{el_type}/>): "{label}" to "{run["last"]}"'))
+                # Later boxes repeating one of the collapsed labels still need their own line.
+                for i in run["ids"]:
+                    key = (bboxes[i].get("type", ""), truncate(bbox_label(bboxes[i]), config.max_chars))
+                    if len(groups[key]) > 1:
+                        lines.append((groups[key][1], f'{format_ids(groups[key][1:])} (<{key[0]}/>): "{key[1]}"'))
+            else:
+                for i in run["ids"]:
+                    key = (bboxes[i].get("type", ""), truncate(bbox_label(bboxes[i]), config.max_chars))
+                    if groups[key][0] == i:
+                        lines.append((i, f'{format_ids(groups[key])} (<{key[0]}/>): "{key[1]}"'))
+        lines = [line for _, line in sorted(lines)]
+    else:
+        lines = [f'{i} (<{bboxes[i].get("type", "")}/>): "{truncate(bbox_label(bboxes[i]), config.max_chars)}"' for i in described]
+
+    descriptions = "Valid Bounding Boxes:\n" + "\n".join(lines)
+    if unchanged:
+        short = ", ".join(f'{i} "{truncate(bbox_label(bboxes[i]), config.unchanged_chars)}"' for i in unchanged)
+        descriptions += f"\nUnchanged since the previous step: {short}"
+    return descriptions, max(0, estimate_tokens(full) - estimate_tokens(descriptions))
@@ -0,0 +1,144 @@
+from typing import Sequence, Optional
+from urllib.parse import urljoin, urlsplit, parse_qs
+import re
+from bs4 import BeautifulSoup
+from src.modules.struct import Order, OrderDetails
+from src.modules.orders import merge_orders
+
+
+# Selectors for the order cards on the orders page, tried in order. Flipkart's class names are generated, so the cards are found through their links to the order details page.
+ORDER_CARD_SELECTORS = [
+    'a[href*="/order_details"]',
+    'a[href*="order_id="]',
+]
+
+PRICE_PATTERN = re.compile(r"₹\s*([\d,]+)")
+
+MONTH = r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*"
+DATE_PATTERN = re.compile(
+    r"(?:Ordered|Order placed|Order Confirmed|Order date)\s*(?:on)?\s*[:,]?\s*"
+    rf"((?:[A-Z][a-z]{{2}},?\s+)?(?:{MONTH}\s+\d{{1,2}}(?:st|nd|rd|th)?(?:,?\s*\d{{4}})?|\d{{1,2}}(?:st|nd|rd|th)?\s+{MONTH},?(?:\s*\d{{4}})?))",
+    re.IGNORECASE,
+)
+# A delivery status line starts with the status, optionally after 'Your item has been'. Product names which only contain a status word are not statuses.
+STATUS_PATTERN = re.compile(
+    r"(?:your (?:item|order) (?:has been|is|was)\s+)?(refund\w*|cancelled|will be delivered|delivered|ordered|shipped|on the way|out for delivery|returned|replaced)\b",
+    re.IGNORECASE,
+)
+STATUS_CODES = {"cancelled": 3, "delivered": 1}
+SELLER_PATTERN = re.compile(r"(?:Seller|Sold by)\s*:?\s*\n?\s*([^\n]+)", re.IGNORECASE)
+ITEM_COUNT_PATTERN = re.compile(r"\b(\d+)\s+items?\b", re.IGNORECASE)
+
+
+def parse_price(text:str)->Optional[int]:
+    """Parses a rupee price like '₹1,299' into an integer. Returns None if the text has no price."""
+    match = PRICE_PATTERN.search(text)
+    return int(match.group(1).replace(",", "")) if match else None
+
+
+def parse_status(text:str)->Optional[int]:
+    """Maps a delivery status line to the delivery_status code of the Order. Returns None if the line does not start with a status."""
+    match = STATUS_PATTERN.match(text.strip())
+    if match is None:
+        return None
+    status = match.group(1).lower()
+    return 2 if status.startswith("refund") else STATUS_CODES.get(status, 0)
+
+
+def parse_order_ids(href:str)->dict:
+    """Parses the order id and the item id of the link to an order details page, like '/order_details?order_id=OD123&item_id=456'. The ids which are not in the link are left out."""
+    query = parse_qs(urlsplit(href).query)
+    return {field: query[field][0] for field in ("order_id", "item_id") if query.get(field)}
+
+
+def parse_order_card(texts:Sequence[str], href:str="")->Optional[Order]:
+    """Parses the text fragments of an order card into an Order. The product name is the first fragment which is neither a price nor a product attribute like 'Color: Black'. The status is the first later fragment which starts with a delivery status, so product names containing a status word are not mistaken for it.
+
+    Args:
+        texts (Sequence[str]): The text fragments of the card, in document order.
+        href (str, optional): The link of the card to its order details page, for the order id. Defaults to ''.
+
+    Returns:
+        Optional[Order]: The order with its ids, or None if the card does not have a name and a price.
+    """
+    name, price, status = None, None, None
+    for text in texts:
+        if parse_price(text) is not None:
+            if price is None:
+                price = parse_price(text)
+        elif name is None:
+            if len(text) > 2 and ":" not in text:
+                name = text
+        elif status is None and parse_status(text) is not None:
+            status = parse_status(text)
+    if name is None or price is None:
+        return None
+    return Order(product_name=name, product_price=price, delivery_status=status if status is not None else 0, **parse_order_ids(href))
+
+
+def parse_orders(html:str)->list:
+    """Parses the order cards of an orders page.
+
+    Args:
+        html (str): The HTML of the orders page.
+
+    Returns:
+        list: The orders on the page, deduped by order_key. Empty if none of the selectors matched.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for selector in ORDER_CARD_SELECTORS:
+        cards = soup.select(selector)
+        if cards:
+            break
+    orders = [parse_order_card(list(card.stripped_strings), card.get("href") or "") for card in cards]
+    return merge_orders([], [order for order in orders if order])
+
+
+def parse_order_links(html:str, base_url:str)->list:
+    """Parses the order cards of an orders page together with the links to their order details pages.
+
+    Args:
+        html (str): The HTML of the orders page.
+        base_url (str): The url of the orders page, to resolve relative links.
+
+    Returns:
+        list: (order, url) tuples, deduped by the url.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for selector in ORDER_CARD_SELECTORS:
+        cards = soup.select(selector)
+        if cards:
+            break
+    links = {}
+    for card in cards:
+        order = parse_order_card(list(card.stripped_strings), card.get("href") or "")
+        if order and card.get("href"):
+            links.setdefault(urljoin(base_url, card["href"]), order)
+    return [(order, url) for url, order in links.items()]
+
+
+def parse_order_details(html:str)->OrderDetails:
+    """Parses the order date, the seller and the number of items of an order details page. The fields which are not found are left out.
+
+    Args:
+        html (str): The HTML of the order details page.
+
+    Returns:
+        OrderDetails: The extended fields of the order.
+    """
+    text = BeautifulSoup(html, "html.parser").get_text("\n")
+    text = "\n".join(line.strip() for line in text.splitlines() if line.strip())
+    details = OrderDetails()
+    match = DATE_PATTERN.search(text)
+    if match:
+        details["order_date"] = " ".join(match.group(1).split())
+    sellers = SELLER_PATTERN.findall(text)
+    if sellers:
+        details["seller"] = sellers[0].strip()
+    match = ITEM_COUNT_PATTERN.search(text)
+    if match:
+        details["item_count"] = int(match.group(1))
+    elif sellers:
+        # Every item of the order is listed with its seller.
+        details["item_count"] = len(sellers)
+    return details
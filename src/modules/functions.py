@@ -3,6 +3,16 @@ from playwright.async_api import Page
 import asyncio
 import platform
 from src.modules.struct import BBox, AgentState, CompleteTask, OutputOrders
+from src.modules.extraction import parse_orders, parse_order_links, parse_order_details
+from src.modules.orders import merge_orders
+from src.modules.helper import read_resource, settle
+
+
+def describe_settle(settled:dict)->str:
+    """Describes the result of `settle` for the tool output."""
+    if settled["settled_on"] == "timeout":
+        return f"The page was still loading after {settled['waited']:.1f}s."
+    return f"The page settled in {settled['waited']:.1f}s."
 
 
 async def click(bbox_id:int, bboxes:Sequence[BBox], page: Page)->dict:
@@ -22,7 +32,8 @@ async def click(bbox_id:int, bboxes:Sequence[BBox], page: Page)->dict:
         return f"Error occured. {e}"
     x, y = bbox["x"], bbox["y"]
     _ = await page.mouse.click(x, y)
-    return {"tool_output": f"Clicked {bbox_id}"}
+    settled = await settle(page)
+    return {"tool_output": f"Clicked {bbox_id}. {describe_settle(settled)}"}
 
 
 async def type_text(page: Page, bbox_id:int, type_content:str, bboxes:Sequence[BBox])->dict:
@@ -45,7 +56,8 @@ async def type_text(page: Page, bbox_id:int, type_content:str, bboxes:Sequence[B
     await page.keyboard.press("Backspace")
     await page.keyboard.type(type_content)
     await page.keyboard.press("Enter")
-    return {"tool_output": f"Typed {type_content} and submitted"}
+    settled = await settle(page)
+    return {"tool_output": f"Typed {type_content} and submitted. {describe_settle(settled)}"}
 
 # Union[Literal['WINDOW'],int]
 async def scroll(page: Page, target: str, direction:Literal['up','down'], bboxes: Sequence[BBox])->dict:
@@ -78,18 +90,58 @@ async def scroll(page: Page, target: str, direction:Literal['up','down'], bboxes
         await page.mouse.move(x, y)
         await page.mouse.wheel(0, scroll_direction)
 
-    return {"tool_output": f"Scrolled {direction} in {'WINDOW' if target == 'WINDOW' else 'element'} with ID {target}."}
+    settled = await settle(page)
+    return {"tool_output": f"Scrolled {direction} in {'WINDOW' if target == 'WINDOW' else 'element'} with ID {target}. {describe_settle(settled)}"}
+
+
+async def scroll_to_end(page: Page, sentinel_text:str="No More Results To Display", sentinel_selector:str="", max_scrolls:int=100)->dict:
+    """Used to scroll the window to the bottom of the page in one go, loading all the lazily loaded items on the way. Scrolling stops when the sentinel text or selector appears, when the page stops growing, or after max_scrolls scrolls. Prefer this over repeated scroll calls on pages with infinite scrolling, like the Flipkart orders page. The orders found on the way are extracted like with extract_orders.
+
+    Args:
+        page (Page): The page to scroll in.
+        sentinel_text (str): The text which marks the end of the page. Defaults to 'No More Results To Display'.
+        sentinel_selector (str): The CSS selector of an element which marks the end of the page. Empty if not used.
+        max_scrolls (int): The maximum number of scrolls to the bottom. Defaults to 100.
+
+    Returns:
+        dict: The value as str with the reason the scrolling stopped and the content of the newly loaded items, with key 'tool_output', and the extracted orders, with key 'orders'.
+    """
+    result = await page.evaluate(read_resource("scripts/scroll_to_end.js"), {
+        "sentinelText": sentinel_text,
+        "sentinelSelector": sentinel_selector,
+        "maxScrolls": max_scrolls,
+        "stallMs": 3000,
+        "maxChars": 4000,
+    })
+    html = await page.content()
+    orders = await asyncio.to_thread(lambda: merge_orders(parse_orders(html), parse_orders(result["html"])))
+    reasons = {
+        "sentinel": "the end of the page was reached",
+        "stalled": "the page stopped loading new content",
+        "max_scrolls": f"the limit of {max_scrolls} scrolls was reached",
+    }
+    tool_output = f"Scrolled to the bottom {result['scrolls']} times and stopped because {reasons[result['reason']]}. {result['added']} new items were loaded."
+    if orders:
+        tool_output += f" Extracted {len(orders)} orders from the page content. These will be saved with OutputOrders without repeating them."
+    elif result["text"]:
+        tool_output += f" Content of the new items:\n{result['text']}"
+    return {"tool_output": tool_output, "orders": orders}
 
 
-async def wait()->dict:
-    """Used to wait for 5 seconds. This is generally used to wait for the page to load.
+async def wait(page: Page, selector:str="")->dict:
+    """Used to wait for the page to load. Waits until the network and the page content are idle or, if a CSS selector is given, until a matching element is visible. Waits for at most 10 seconds.
+
+    Args:
+        page (Page): The page to wait on.
+        selector (str): The CSS selector of the element to wait for. Empty to wait for the page to be idle.
 
     Returns:
-        dict: The value as str with the message that the wait is complete, with key 'tool_output'.
+        dict: The value as str with the message that the wait is complete and how long it took, with key 'tool_output'.
     """
-    sleep_time = 5
-    await asyncio.sleep(sleep_time)
-    return {"tool_output": f"Waited for {sleep_time}s."}
+    settled = await settle(page, selector=selector or None, timeout=10)
+    if settled["settled_on"] == "timeout":
+        return {"tool_output": f"Waited for {settled['waited']:.1f}s, the page is still loading."}
+    return {"tool_output": f"Waited for {settled['waited']:.1f}s, the page has loaded."}
 
 
 async def go_back(page: Page)->dict:
@@ -102,7 +154,8 @@ async def go_back(page: Page)->dict:
         dict: The value as str with the message that the navigation is complete, with key 'tool_output'.
     """
     await page.go_back()
-    return {"tool_output": f"Navigated back a page to {page.url}."}
+    settled = await settle(page)
+    return {"tool_output": f"Navigated back a page to {page.url}. {describe_settle(settled)}"}
 
 
 async def to_google(page: Page)->dict:
@@ -115,7 +168,70 @@ async def to_google(page: Page)->dict:
         dict: The value as str with the message that the navigation is complete, with key 'tool_output'.
     """
     await page.goto("https://www.google.com/")
-    return {"tool_output": "Navigated to google.com."}
+    settled = await settle(page)
+    return {"tool_output": f"Navigated to google.com. {describe_settle(settled)}"}
+
+
+async def extract_orders(page: Page)->dict:
+    """Used to extract the orders listed on the Flipkart orders page directly from the page content, without reading them from the screenshot. Call this on the orders page, after every scroll that loads new orders. The extracted orders are saved by OutputOrders, so they do not need to be repeated in it. If no orders could be extracted, read the orders from the screenshots instead.
+
+    Args:
+        page (Page): The page to extract the orders from.
+
+    Returns:
+        dict: The value as str with the number of extracted orders, with key 'tool_output', and the extracted orders, with key 'orders'.
+    """
+    html = await page.content()
+    orders = await asyncio.to_thread(parse_orders, html)
+    if not orders:
+        return {"tool_output": "No orders could be extracted from the page content. Read the orders from the screenshots instead, and pass them to OutputOrders."}
+    return {"tool_output": f"Extracted {len(orders)} orders from the page content. These will be saved with OutputOrders without repeating them.", "orders": orders}
+
+
+async def extract_order_details(page: Page, max_tabs:int=4)->dict:
+    """Used to extract the order date, the seller and the number of items of every order listed on the Flipkart orders page. The order details pages are opened in background tabs, several at a time, so the orders page itself stays where it is. Call this after all the orders are loaded and extracted. The details are saved with the orders, so they do not need to be passed to OutputOrders.
+
+    Args:
+        page (Page): The orders page.
+        max_tabs (int): The maximum number of order details pages open at the same time. Defaults to 4.
+
+    Returns:
+        dict: The value as str with the number of orders whose details were extracted, with key 'tool_output', and the orders with their details, with key 'orders'.
+    """
+    html = await page.content()
+    links = await asyncio.to_thread(parse_order_links, html, page.url)
+    if not links:
+        return {"tool_output": "No links to order details pages were found on this page. Call this on the Flipkart orders page."}
+
+    queue = list(reversed(links))
+    orders = []
+    failed = 0
+
+    async def worker():
+        nonlocal failed
+        tab = await page.context.new_page()
+        try:
+            while queue:
+                order, url = queue.pop()
+                try:
+                    await tab.goto(url)
+                    await settle(tab)
+                    details = await asyncio.to_thread(parse_order_details, await tab.content())
+                except Exception:
+                    failed += 1
+                    continue
+                if details:
+                    orders.append({**order, **details})
+                else:
+                    failed += 1
+        finally:
+            await tab.close()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(max_tabs, len(links))))))
+    tool_output = f"Opened {len(links)} order details pages, at most {max_tabs} at a time, and extracted the details of {len(orders)} orders."
+    if failed:
+        tool_output += f" The details of {failed} orders could not be extracted."
+    return {"tool_output": tool_output, "orders": orders}
 
 
 async def to_user(query:str)->dict:
@@ -128,7 +244,8 @@ async def to_user(query:str)->dict:
         dict: The value as str with the response from the user, with key 'tool_output'.
     """
     display_text = f"{query}. Enter 'exit' to exit: "
-    response = input(display_text)
+    # input() blocks, so it runs in a thread to keep other sessions on the event loop going.
+    response = await asyncio.to_thread(input, display_text)
     response_text = f"AI: {query}\nUser: {response}"
     return {'tool_output':response_text}
 
@@ -145,4 +262,9 @@ def agent_router(state: AgentState):
         else:
             return function_name
     else:
-        return '__end__'
\ No newline at end of file
+        return '__end__'
+
+
+def resume_router(state: AgentState):
+    """Routing function for the entry point. A run resumed from a checkpoint enters at the node it stopped before, any other run at the agent."""
+    return state.get('resume_node') or 'agent'
@@ -1,7 +1,8 @@
+from functools import cache
 from langgraph.graph import StateGraph, END
 from src.modules.struct import AgentState
-from src.modules.runnables import agent_chain, update_scratchpad, click_node, type_text_node, scroll_node, wait, go_back_node, to_google_node, structure_orders, to_user_node
-from src.modules.functions import agent_router
+from src.modules.runnables import get_agent_chain, update_scratchpad, click_node, type_text_node, scroll_node, wait_node, go_back_node, to_google_node, structure_orders, to_user_node, extract_orders_node, scroll_to_end_node, extract_order_details_node
+from src.modules.functions import agent_router, resume_router
 from langgraph.graph.state import CompiledStateGraph
 
 
@@ -14,8 +15,7 @@ def build_flipkart_scraper_graph()->CompiledStateGraph:
 
     builder = StateGraph(AgentState)
 
-    builder.add_node('agent', agent_chain)
-    builder.set_entry_point('agent')
+    builder.add_node('agent', get_agent_chain())
 
     builder.add_node('update_scratchpad', update_scratchpad)
     builder.add_edge('update_scratchpad', 'agent')
@@ -24,11 +24,14 @@ def build_flipkart_scraper_graph()->CompiledStateGraph:
         'click':click_node,
         'type_text':type_text_node,
         'scroll':scroll_node,
-        'wait':wait,
+        'scroll_to_end':scroll_to_end_node,
+        'wait':wait_node,
         'go_back':go_back_node,
         'to_google':to_google_node,
         'structure_orders': structure_orders,
-        'to_user': to_user_node
+        'to_user': to_user_node,
+        'extract_orders': extract_orders_node,
+        'extract_order_details': extract_order_details_node
     }
 
     for node_name, tool in tools_dict.items():
@@ -45,13 +48,32 @@ def build_flipkart_scraper_graph()->CompiledStateGraph:
             'click':'click',
             'type_text':'type_text',
             'scroll':'scroll',
+            'scroll_to_end':'scroll_to_end',
             'wait':'wait',
             'go_back':'go_back',
             'to_google':'to_google',
-            'to_user':'to_user'
+            'to_user':'to_user',
+            'extract_orders':'extract_orders',
+            'extract_order_details':'extract_order_details'
         }
     )
 
+    # Runs resumed from a checkpoint enter at the node they stopped before.
+    builder.set_conditional_entry_point(
+        resume_router,
+        {node_name: node_name for node_name in ['agent', 'update_scratchpad', *tools_dict]}
+    )
+
     graph = builder.compile()
 
-    return graph
\ No newline at end of file
+    return graph
+
+
+@cache
+def get_graph()->CompiledStateGraph:
+    """Returns the flipkart scraper graph, built on first use and shared afterwards. The compiled graph keeps no state between runs, so the runs of a process can share it.
+
+    Returns:
+        CompiledStateGraph: The compiled state graph.
+    """
+    return build_flipkart_scraper_graph()
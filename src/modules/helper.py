@@ -1,8 +1,20 @@
 from langchain_core.runnables import chain
-import base64
 import asyncio
-from playwright.async_api import Page
+import time
+from functools import cache
+from pathlib import Path
+from playwright.async_api import Page, BrowserContext
 from langgraph.graph.state import CompiledStateGraph
+from src.modules.struct import ScreenshotConfig
+from src.modules.change_detection import ChangeStats
+from src.modules.routing import TierStats
+from src.modules.tracing import Tracer, TracedPage
+from src.modules.screenshot import bboxes_clip, needs_reencoding, encode_for_prompt
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # The checkpoint module imports the tools, which import this module.
+    from src.modules.checkpoint import Checkpointer
 
 
 def read_file(filepath:str)->str:
@@ -18,35 +30,164 @@ def read_file(filepath:str)->str:
         return f.read()
 
 
-mark_page_script = read_file("src/scripts/mark_page.js")
+# The directory of the src package, which ships the prompts and the scripts.
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+
+
+@cache
+def read_resource(name:str)->str:
+    """Reads a file shipped with the src package, like a prompt or a script. The path is resolved against the package instead of the working directory, and the file is read once on first use.
+
+    Args:
+        name (str): The path of the file inside the package, like 'prompts/system_prompt.txt'.
+
+    Returns:
+        str: The content of the file.
+    """
+    return (PACKAGE_DIR / name).read_text()
+
+
+# Calls markPage() if the script is present in the current document, else returns null so that the caller can install it.
+mark_page_call = "() => typeof markPage === 'function' ? markPage() : null"
+
+
+async def install_mark_page(target: BrowserContext | Page):
+    """Installs the mark page script as an init script, so that it is present in every document loaded after this call, and evaluates it in the documents which are already open.
+
+    Args:
+        target (BrowserContext | Page): The browser context or the page to install the script in.
+    """
+    mark_page_script = read_resource("scripts/mark_page.js")
+    await target.add_init_script(script=mark_page_script)
+    pages = target.pages if isinstance(target, BrowserContext) else [target]
+    for page in pages:
+        await page.evaluate(mark_page_script)
 
 
 @chain
-async def mark_page(page: Page)->dict:
+async def mark_page(inputs: dict)->dict:
     """Annotates the elements on the page and returns the screenshot with the bounding boxes.
 
+    The mark page script is expected to be installed with `install_mark_page`. It is evaluated here only if the current document does not have it, which costs one extra round trip. Failed attempts are retried up to 10 times, with a backoff starting at 0.25s and doubling up to 3s.
+
     Args:
-        page (Page): The page to mark.
+        inputs (dict): The page to mark, with key 'page', and optionally the ScreenshotConfig to encode the screenshot with, with key 'screenshot_config'.
 
     Returns:
-        dict: The screenshot of the page with the bounding boxes.
+        dict: The encoded screenshot of the page with the bounding boxes, its mime type and its size in bytes.
     """
-    await page.evaluate(mark_page_script)
-    for _ in range(10):
+    page = inputs["page"]
+    config = inputs.get("screenshot_config") or ScreenshotConfig()
+    retries = 10
+    for attempt in range(retries):
         try:
-            bboxes = await page.evaluate("markPage()")
+            bboxes = await page.evaluate(mark_page_call)
+            if bboxes is None:
+                await page.evaluate(read_resource("scripts/mark_page.js"))
+                bboxes = await page.evaluate("markPage()")
             break
-        except:
-            asyncio.sleep(3)
-    screenshot = await page.screenshot()
-    await page.evaluate("unmarkPage()")
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            await asyncio.sleep(min(0.25 * 2 ** attempt, 3))
+
+    screenshot_kwargs = {"scale": "css"}
+    if config.clip_to_bboxes and page.viewport_size:
+        clip = bboxes_clip(bboxes, page.viewport_size, config.clip_margin)
+        if clip:
+            screenshot_kwargs["clip"] = clip
+    if not needs_reencoding(config) and config.format == "jpeg":
+        screenshot_kwargs.update(type="jpeg", quality=config.quality)
+    screenshot = await page.screenshot(**screenshot_kwargs)
+
+    # The labels are not needed once the screenshot is taken, so the unmark round trip runs while the screenshot is encoded in a thread.
+    unmark = asyncio.create_task(page.evaluate("unmarkPage()"))
+    screenshot, img = await asyncio.to_thread(encode_for_prompt, screenshot, config)
+    await unmark
     return {
-        "img": base64.b64encode(screenshot).decode(),
+        "img": img,
+        "img_mime": f"image/{config.format}",
+        "img_bytes": len(screenshot),
         "bboxes": bboxes,
     }
 
 
-async def call_agent(question: str, page: Page, graph: CompiledStateGraph, max_steps:int=10):
+async def wait_for_dom_quiet(page: Page, quiet:float, deadline:float)->bool:
+    """Waits until the DOM of the page has not changed for `quiet` seconds. If the page navigates while waiting, waits for the new document to be parsed and starts over.
+
+    Args:
+        page (Page): The page to watch.
+        quiet (float): The quiet period in seconds.
+        deadline (float): The time.perf_counter() value after which to give up.
+
+    Returns:
+        bool: True if the DOM went quiet before the deadline.
+    """
+    while time.perf_counter() < deadline:
+        remaining = deadline - time.perf_counter()
+        try:
+            return await page.evaluate(read_resource("scripts/dom_quiet.js"), {"quietMs": quiet * 1000, "timeoutMs": remaining * 1000})
+        except Exception:
+            # The execution context was destroyed by a navigation.
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=max(remaining, 0.001) * 1000)
+            except Exception:
+                return False
+    return False
+
+
+async def settle(page: Page, selector:str|None=None, timeout:float=5.0, quiet:float=0.3)->dict:
+    """Waits for the page to settle after an action, instead of sleeping for a fixed time. The page is settled when the given selector is visible or, without a selector, when there have been no network requests in flight and no DOM mutations for `quiet` seconds. Waits at most `timeout` seconds.
+
+    Args:
+        page (Page): The page to wait on.
+        selector (str | None, optional): A CSS selector to wait for instead of the network and the DOM. Defaults to None.
+        timeout (float, optional): The maximum time to wait in seconds. Defaults to 5.0.
+        quiet (float, optional): The quiet period in seconds. Defaults to 0.3.
+
+    Returns:
+        dict: The time actually waited in seconds, with key 'waited', and what the page settled on ('selector', 'idle' or 'timeout'), with key 'settled_on'.
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    if selector:
+        try:
+            await page.wait_for_selector(selector, state="visible", timeout=timeout * 1000)
+            settled_on = "selector"
+        except Exception:
+            settled_on = "timeout"
+        return {"waited": time.perf_counter() - start, "settled_on": settled_on}
+
+    in_flight = set()
+    last_activity = [start]
+    def on_request(request):
+        in_flight.add(request)
+        last_activity[0] = time.perf_counter()
+    def on_request_done(request):
+        in_flight.discard(request)
+        last_activity[0] = time.perf_counter()
+
+    page.on("request", on_request)
+    page.on("requestfinished", on_request_done)
+    page.on("requestfailed", on_request_done)
+    dom_quiet = asyncio.ensure_future(wait_for_dom_quiet(page, quiet, deadline))
+    try:
+        settled_on = "timeout"
+        while time.perf_counter() < deadline:
+            network_idle = not in_flight and time.perf_counter() - last_activity[0] >= quiet
+            if network_idle and dom_quiet.done():
+                settled_on = "idle" if dom_quiet.result() else "timeout"
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        page.remove_listener("request", on_request)
+        page.remove_listener("requestfinished", on_request_done)
+        page.remove_listener("requestfailed", on_request_done)
+        dom_quiet.cancel()
+    return {"waited": time.perf_counter() - start, "settled_on": settled_on}
+
+
+async def call_agent(question: str, page: Page, graph: CompiledStateGraph, max_steps:int=10, configurable:dict|None=None, tracer:Tracer|None=None, checkpointer:'Checkpointer|None'=None, stream:bool=False, **state_kwargs):
     """Calls the agent with the given question, page and graph.
 
     Args:
@@ -54,25 +195,71 @@ async def call_agent(question: str, page: Page, graph: CompiledStateGraph, max_s
         page (Page): The page to interact with.
         graph (CompiledStateGraph): The compiled state graph.
         max_steps (int, optional): The maximum number of steps to run the agent. Defaults to 10.
+        configurable (dict | None, optional): Runtime objects for the graph nodes, like a 'cassette' to record or replay the run. A fresh ChangeStats is added as 'change_stats' and a fresh TierStats as 'tier_stats', so that the change detector and model tier statistics printed at the end are the ones of this run. Defaults to None.
+        tracer (Tracer | None, optional): Collects the span timings of the graph nodes and the Playwright calls, and the tokens and image bytes per step. Its summary is printed at the end of the run. Defaults to None.
+        checkpointer (Checkpointer | None, optional): Saves the state after every node. If it holds the checkpoint of an incomplete run, that run is resumed instead of starting a new one with the question. Defaults to None.
+        stream (bool, optional): If true, the response of the model is printed live as it is generated, and the tool runs as soon as its arguments are complete. Defaults to False.
+        **state_kwargs: Additional keys of the initial agent state, like 'screenshot_config' or 'routing'.
     """
 
+    if tracer is not None:
+        page = TracedPage(page, tracer)
+
+    initial_state = {
+        'page':page,
+        'input':question,
+        'scratchpad':[],
+        **state_kwargs,
+    }
+    checkpoint = checkpointer.load() if checkpointer is not None else None
+    if checkpoint is not None:
+        print(f"Resuming from {checkpointer.path} at the '{checkpoint['next']}' node on {checkpoint['url']}")
+        await checkpointer.restore_page(page, checkpoint)
+        initial_state = {**checkpoint['state'], 'page':page, 'resume_node':checkpoint['next']}
+
+    configurable = dict(configurable or {})
+    change_stats = configurable.setdefault('change_stats', ChangeStats())
+    tier_stats = configurable.setdefault('tier_stats', TierStats())
+    streamed = []
+    if stream:
+        def print_token(token:str):
+            if not streamed:
+                print("<","-"*10,"AI MESSAGE","-"*10,">\n")
+            streamed.append(token)
+            print(token, end='', flush=True)
+        configurable['on_token'] = print_token
+
     event_stream = graph.astream(
-        input = {
-            'page':page,
-            'input':question,
-            'scratchpad':[],
-        },
+        input = initial_state,
         config={
-            'recursion_limit':max_steps
-        }
+            'recursion_limit':max_steps,
+            'configurable':configurable,
+            'callbacks':[tracer] if tracer is not None else [],
+        },
+        stream_mode=['updates', 'values'],
     )
 
-    async for event in event_stream:
-        
+    node = None
+    async for mode, event in event_stream:
+
+        # The full state after each node comes as a 'values' event, right after the 'updates' event of the node.
+        if mode == 'values':
+            if checkpointer is not None and node is not None:
+                await checkpointer.save(event, node, page)
+            continue
+        node = next(iter(event), None)
+
         if "agent" in event:
             message = event['agent']['scratchpad'][-1]
-            print("<","-"*10,"AI MESSAGE","-"*10,">\n")
-            print(message.content)
+            # A streamed response was already printed while it was generated. Cached and replayed ones were not streamed.
+            if streamed:
+                print("\n")
+            else:
+                print("<","-"*10,"AI MESSAGE","-"*10,">\n")
+            print(f"Screenshot: {event['agent'].get('img_bytes', 0)} bytes ({event['agent'].get('img_mime')}), prompt tokens: {event['agent'].get('prompt_tokens', 0)}, saved on descriptions: {event['agent'].get('description_tokens_saved', 0)}")
+            if not streamed:
+                print(message.content)
+            streamed.clear()
             if message.additional_kwargs:
                 function_call = message.additional_kwargs['function_call']
                 function_name = function_call['name']
@@ -85,4 +272,9 @@ async def call_agent(question: str, page: Page, graph: CompiledStateGraph, max_s
             print(message.content,'\n')
         
         else:
-            pass
\ No newline at end of file
+            pass
+
+    print(f"Change detector: {change_stats}")
+    print(f"Model tiers: {tier_stats}")
+    if tracer is not None:
+        tracer.print_summary()
\ No newline at end of file
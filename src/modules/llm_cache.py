@@ -0,0 +1,167 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from langchain_core.messages import AIMessage, messages_to_dict, messages_from_dict
+from langchain_core.prompt_values import PromptValue
+from src.modules.change_detection import dhash
+
+
+# The kinds of llm calls which can bypass the cache: the routing tier of the call, and how the page is observed in its prompt.
+CALL_KINDS = ('main', 'cheap', 'screenshot', 'unchanged', 'text_only')
+
+# Tool outputs carry how long the page took to settle, which differs between otherwise identical steps.
+DURATION_PATTERN = re.compile(r"\b\d+\.\d+s\b")
+
+
+def normalize_text(text:str)->str:
+    """Collapses the whitespace of a text and masks the durations in it."""
+    return DURATION_PATTERN.sub("<t>s", " ".join(text.split()))
+
+
+def image_key(url:str)->str:
+    """Returns the part of the cache key for an image url: the difference hash of a base64 data url, else the hash of the url."""
+    if url.startswith("data:") and ";base64," in url:
+        try:
+            return f"image:{dhash(url.split(',', 1)[1]):016x}"
+        except (ValueError, OSError):
+            pass
+    return "image:" + hashlib.sha256(url.encode()).hexdigest()
+
+
+def cache_key(prompt_value:PromptValue, model:str, **params)->str:
+    """Hashes a prompt into a cache key. Texts are normalized with `normalize_text`. Screenshots are replaced by their difference hash, since two screenshots of the same page are rarely identical byte for byte, and other images by the hash of their url, so that the key stays small.
+
+    Args:
+        prompt_value (PromptValue): The formatted prompt.
+        model (str): The name of the model, since the same prompt gives different responses on different models.
+        **params: Other parameters of the call which change the response, like the bound functions.
+
+    Returns:
+        str: The hex digest.
+    """
+    messages = []
+    for message in prompt_value.to_messages():
+        if isinstance(message.content, str):
+            parts = [normalize_text(message.content)]
+        else:
+            parts = []
+            for part in message.content:
+                if not isinstance(part, dict):
+                    parts.append(normalize_text(str(part)))
+                elif part.get("type") == "image_url":
+                    url = part["image_url"]["url"] if isinstance(part["image_url"], dict) else part["image_url"]
+                    parts.append(image_key(url))
+                else:
+                    parts.append(normalize_text(part.get("text", "")))
+        messages.append([message.type, parts, message.additional_kwargs.get("function_call")])
+    payload = json.dumps({"model": model, "params": params, "messages": messages}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMCache:
+    """Caches llm responses by the hash of the prompt, in an in-memory LRU tier and an on-disk tier shared between runs.
+
+    Every response is one JSON file in the directory. Files older than `ttl` seconds are expired, and the least recently used files are removed once the directory grows beyond `max_bytes`. Calls of the kinds in `skip_kinds`, one of the CALL_KINDS, bypass the cache. For example 'cheap' leaves the routine steps of the cheap tier out, and 'unchanged' the steps where the page did not change. Skipped calls are counted apart from the lookups."""
+
+    def __init__(self, directory:str=".llm_cache", max_entries:int=256, max_bytes:int=50_000_000, ttl:float=7 * 24 * 3600, skip_kinds:tuple=()):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.skip_kinds = set(skip_kinds)
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def enabled_for(self, kinds:tuple)->bool:
+        """Whether a call of the given kinds, like ('cheap', 'text_only'), uses the cache. Skipped calls are counted."""
+        if self.skip_kinds.intersection(kinds):
+            self.skipped += 1
+            return False
+        return True
+
+    def path(self, key:str)->str:
+        """The file of the key in the disk tier."""
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key:str)->AIMessage|None:
+        """Returns the cached response for the key, from memory or else from disk, or None on a miss."""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return self.memory[key]
+        path = self.path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path) as f:
+                message = messages_from_dict([json.load(f)])[0]
+            # The access time is kept in the modification time, so that the eviction removes the least recently used files.
+            os.utime(path)
+        except (FileNotFoundError, ValueError, KeyError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.disk_hits += 1
+            self.remember(key, message)
+        return message
+
+    def put(self, key:str, message:AIMessage):
+        """Caches a response in memory and on disk, and evicts the expired and least recently used files."""
+        with self.lock:
+            self.remember(key, message)
+        path = self.path(key)
+        with open(path + ".tmp", "w") as f:
+            json.dump(messages_to_dict([message])[0], f)
+        os.replace(path + ".tmp", path)
+        with self.lock:
+            self.evict()
+
+    def remember(self, key:str, message:AIMessage):
+        """Adds a response to the memory tier, dropping the least recently used one beyond `max_entries`. The lock must be held."""
+        self.memory[key] = message
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def evict(self):
+        """Removes the expired files, then the least recently used files until the directory fits in `max_bytes`. The lock must be held."""
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime > self.ttl:
+                os.remove(entry.path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    @property
+    def hit_rate(self)->float:
+        """The fraction of cache lookups which were served from memory or disk. Calls which skipped the cache are not lookups."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def __str__(self)->str:
+        return (
+            f"{self.memory_hits + self.disk_hits + self.misses} lookups with {self.memory_hits} memory hits, {self.disk_hits} disk hits, {self.misses} misses ({self.hit_rate:.0%} hit rate), "
+            f"{self.skipped} calls skipped the cache" + (f" ({', '.join(sorted(self.skip_kinds))})" if self.skip_kinds else "")
+        )
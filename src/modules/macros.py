@@ -0,0 +1,134 @@
+from typing import Sequence
+from urllib.parse import urlsplit
+import json
+import os
+from langchain_core.messages import AIMessage
+from src.modules.struct import BBox
+
+
+# Tool calls which only move the agent towards the page of the task. The first other call ends the navigation prefix.
+NAVIGATION_TOOLS = ('click', 'type_text', 'go_back', 'to_google', 'to_user', 'wait')
+
+
+def normalize_url(url:str)->str:
+    """Drops the query and the fragment of a url, since they carry session tokens and return urls."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path.rstrip('/')}"
+
+
+def element_signature(bbox:BBox)->str:
+    """Identifies an element by its type and its label, independently of its position and its bbox ID."""
+    label = bbox.get("ariaLabel", "").strip() or bbox.get("text", "")
+    return f"{bbox.get('type', '')}|{' '.join(label.split())[:80]}"
+
+
+class MacroCache:
+    """Learns the navigation prefix of the task, like opening the login page and then the orders page, and replays it without calling the model.
+
+    While the agent runs, every navigation call is recorded with the url of the page and the signature of the element it acts on. When the agent makes its first other call, the prefix counts as successful and is saved in a JSON file, keyed by the url it started on. A later run starting on the same url replays the saved steps one by one, as long as the url matches and the element is found on the page, by its signature, under whichever bbox ID it has now. On the first divergence, the control goes back to the model for the rest of the run, and the prefix the model completes replaces the saved one."""
+
+    def __init__(self, path:str="macros.json"):
+        self.path = path
+        self.macros = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.macros = json.load(f)
+        self.steps = []
+        self.macro = None
+        self.cursor = 0
+        self.done = False
+        self.replayed = 0
+        self.diverged = 0
+        self.learned = 0
+        self.finished = False
+
+    def step(self, url:str, message:AIMessage, bboxes:Sequence[BBox])->dict|None:
+        """Turns a decision of the model into a step of a macro.
+
+        Args:
+            url (str): The url of the page the decision was made on.
+            message (AIMessage): The decision of the model.
+            bboxes (Sequence[BBox]): The list of bounding boxes on the page.
+
+        Returns:
+            dict|None: The step, or None if the call is not a navigation call.
+        """
+        function_call = message.additional_kwargs.get("function_call") or {}
+        if function_call.get("name") not in NAVIGATION_TOOLS:
+            return None
+        element = None
+        try:
+            arguments = json.loads(function_call.get("arguments") or "{}")
+            if "bbox_id" in arguments:
+                element = element_signature(bboxes[int(arguments["bbox_id"])])
+        except (IndexError, ValueError):
+            return None
+        return {"url": normalize_url(url), "name": function_call["name"], "arguments": arguments, "element": element}
+
+    def replay(self, url:str, bboxes:Sequence[BBox])->AIMessage|None:
+        """Returns the next step of the macro for the current page as a decision of the model, or None if there is no macro or the page diverged from it.
+
+        Args:
+            url (str): The url of the current page.
+            bboxes (Sequence[BBox]): The list of bounding boxes on the current page.
+
+        Returns:
+            AIMessage|None: The decision to take.
+        """
+        if self.done:
+            return None
+        if self.macro is None:
+            self.macro = self.macros.get(normalize_url(url))
+            if not self.macro:
+                self.done = True
+                return None
+        if self.cursor >= len(self.macro):
+            self.done = True
+            return None
+        step = self.macro[self.cursor]
+        arguments = dict(step["arguments"])
+        matches = normalize_url(url) == step["url"]
+        if matches and step["element"] is not None:
+            signatures = [element_signature(bbox) for bbox in bboxes]
+            recorded_id = int(arguments["bbox_id"])
+            if recorded_id >= len(signatures) or signatures[recorded_id] != step["element"]:
+                if step["element"] in signatures:
+                    arguments["bbox_id"] = signatures.index(step["element"])
+                else:
+                    matches = False
+        if not matches:
+            self.diverged += 1
+            self.done = True
+            return None
+        self.cursor += 1
+        self.replayed += 1
+        self.steps.append({**step, "arguments": arguments})
+        return AIMessage(
+            content=f"Replaying step {self.cursor} of the recorded navigation from {self.macro[0]['url']}.",
+            additional_kwargs={"function_call": {"name": step["name"], "arguments": json.dumps(arguments)}},
+        )
+
+    def record(self, url:str, message:AIMessage, bboxes:Sequence[BBox]):
+        """Records a decision of the model. The first decision which is not a navigation call saves the recorded prefix, unless all of it was replayed.
+
+        Args:
+            url (str): The url of the page the decision was made on.
+            message (AIMessage): The decision of the model.
+            bboxes (Sequence[BBox]): The list of bounding boxes on the page.
+        """
+        if self.finished or not message.additional_kwargs.get("function_call"):
+            return
+        self.done = True
+        step = self.step(url, message, bboxes)
+        if step is not None:
+            self.steps.append(step)
+            return
+        self.finished = True
+        if len(self.steps) > self.replayed:
+            self.macros[self.steps[0]["url"]] = self.steps
+            with open(self.path, "w") as f:
+                json.dump(self.macros, f, indent=2)
+            self.learned = len(self.steps)
+
+    def __str__(self)->str:
+        return f"{self.replayed} navigation steps replayed, {self.diverged} divergences, {self.learned} steps learned"
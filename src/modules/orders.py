@@ -0,0 +1,103 @@
+from typing import Sequence, Optional
+import re
+
+
+def normalize_name(name:str)->str:
+    """Normalizes a product name for comparison: lower case, without punctuation and repeated whitespace.
+
+    Args:
+        name (str): The product name.
+
+    Returns:
+        str: The normalized product name.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", name.lower()).split())
+
+
+def coerce_price(price)->Optional[int]:
+    """Reads a price given as a number or as a text like '₹1,299' or 'Rs. 1,299.00'. Returns None if it has no price."""
+    if isinstance(price, bool):
+        return None
+    if isinstance(price, (int, float)):
+        return round(price)
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", str(price or ""))
+    return round(float(match.group().replace(",", ""))) if match else None
+
+
+def coerce_order(order)->Optional[dict]:
+    """Checks an order passed by the model and coerces its fields to the types of an Order. The price may be a text like '₹1,299', and the delivery status a numeric text.
+
+    Args:
+        order: The order, as parsed from the arguments of the model.
+
+    Returns:
+        Optional[dict]: The order with an int price and delivery status, or None if the name, the price or a valid delivery status is missing.
+    """
+    if not isinstance(order, dict) or not str(order.get('product_name') or '').strip():
+        return None
+    price = coerce_price(order.get('product_price'))
+    try:
+        status = int(order.get('delivery_status'))
+    except (TypeError, ValueError):
+        return None
+    if price is None or status not in (0, 1, 2, 3):
+        return None
+    return {**order, 'product_name': str(order['product_name']).strip(), 'product_price': price, 'delivery_status': status}
+
+
+def name_price_key(order:dict)->str:
+    """Returns the key of an order made of the normalized product name and the price.
+
+    Args:
+        order (dict): The order, as an Order.
+
+    Returns:
+        str: The name and price key of the order.
+    """
+    return f"{normalize_name(order['product_name'])}|{order['product_price']}"
+
+
+def order_key(order:dict)->str:
+    """Returns the stable key of an order. Orders read from the orders page carry the order id of their order details link, and the item id for orders of several items, so repeat purchases of the same product at the same price stay apart. Orders without an id, like the ones passed by the model, fall back to the name_price_key. Used to dedupe the orders.
+
+    Args:
+        order (dict): The order, as an Order.
+
+    Returns:
+        str: The key of the order.
+    """
+    if order.get('order_id'):
+        return f"id:{order['order_id']}:{order.get('item_id') or ''}"
+    return name_price_key(order)
+
+
+def merge_orders(existing:Sequence[dict], new:Sequence[dict])->list:
+    """Merges two lists of orders, keeping the first occurrence of every order_key. An order without an id is the same as an order with the same name and price, and an order with an id is the same as one without an id with the same name and price, so the orders passed by the model are merged into the ones read from the page. Fields missing from the first occurrence, like the order details, are taken from the later ones. Used as the reducer of the orders in the agent state.
+
+    Args:
+        existing (Sequence[dict]): The orders collected so far.
+        new (Sequence[dict]): The new orders.
+
+    Returns:
+        list: The merged orders.
+    """
+    merged = []
+    positions = {}
+    by_name_price = {}
+    for order in list(existing or []) + list(new or []):
+        key = order_key(order)
+        position = positions.get(key)
+        if position is None:
+            position = next(
+                (candidate for candidate in by_name_price.get(name_price_key(order), []) if not order.get('order_id') or not merged[candidate].get('order_id')),
+                None,
+            )
+        if position is None:
+            position = len(merged)
+            merged.append(order)
+            by_name_price.setdefault(name_price_key(order), []).append(position)
+        else:
+            merged[position] = {**order, **merged[position]}
+        positions[key] = position
+        positions[order_key(merged[position])] = position
+    return merged
@@ -0,0 +1,128 @@
+import asyncio
+import re
+import time
+from playwright.async_api import BrowserContext, Page, Route, Request, Error
+from src.modules.struct import PageProfile
+
+
+class NetworkStats:
+    """Collects the load time, the requests, the blocked requests and the downloaded bytes of every navigation in a browser context. A navigation starts with the request of the document of a main frame, and lasts until the next one on the same page. The saved bytes are only known if they are measured, and are printed as '-' otherwise."""
+
+    def __init__(self, measure_saved_bytes:bool=False):
+        self.navigations = []
+        self.current = {}
+        self.pending = set()
+        self.measure_saved_bytes = measure_saved_bytes
+
+    def navigation(self, page:Page)->dict|None:
+        """Returns the current navigation of the page, or None before its first one."""
+        return self.current.get(page)
+
+    def start(self, page:Page, url:str):
+        """Starts a new navigation of the page."""
+        navigation = {"url": url, "start": time.perf_counter(), "load_time": None, "requests": 0, "blocked": 0, "bytes": 0, "bytes_saved": 0}
+        self.navigations.append(navigation)
+        self.current[page] = navigation
+
+    def summary(self)->dict:
+        """Sums up the navigations.
+
+        Returns:
+            dict: The number of navigations, the mean load time in seconds, and the totals of the requests, blocked requests, downloaded bytes and saved bytes.
+        """
+        load_times = [navigation["load_time"] for navigation in self.navigations if navigation["load_time"] is not None]
+        return {
+            "navigations": len(self.navigations),
+            "mean_load_time": sum(load_times) / len(load_times) if load_times else 0.0,
+            **{key: sum(navigation[key] for navigation in self.navigations) for key in ("requests", "blocked", "bytes", "bytes_saved")},
+        }
+
+    async def wait_measurements(self):
+        """Waits for the HEAD requests which measure the saved bytes, so that the summary includes them."""
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+
+    def print_summary(self):
+        """Prints the statistics of every navigation and the totals."""
+        print(f"{'load s':>7} {'requests':>9} {'blocked':>8} {'kB':>8} {'kB saved':>9}  url")
+        for navigation in self.navigations:
+            load_time = f"{navigation['load_time']:.2f}" if navigation["load_time"] is not None else "-"
+            saved = f"{navigation['bytes_saved'] / 1000:.1f}" if self.measure_saved_bytes else "-"
+            print(f"{load_time:>7} {navigation['requests']:>9} {navigation['blocked']:>8} {navigation['bytes'] / 1000:>8.1f} {saved:>9}  {navigation['url'][:80]}")
+        summary = self.summary()
+        if not self.measure_saved_bytes:
+            del summary["bytes_saved"]
+        print(", ".join(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}" for key, value in summary.items()))
+
+
+def request_page(request:Request)->Page|None:
+    """Returns the page a request was made from, or None for the requests of service workers."""
+    try:
+        return request.frame.page
+    except Error:
+        return None
+
+
+async def apply_profile(context:BrowserContext, profile:PageProfile)->NetworkStats:
+    """Installs the request blocking of the profile on a browser context, and starts collecting the network statistics of its pages. Allowed requests fall back to the routes installed before, like the HAR routing of a cassette.
+
+    Args:
+        context (BrowserContext): The browser context.
+        profile (PageProfile): The page profile.
+
+    Returns:
+        NetworkStats: The statistics, updated as the pages of the context load.
+    """
+    stats = NetworkStats(profile.measure_saved_bytes)
+    block_types = set(profile.block_resource_types)
+    block_urls = re.compile("|".join(profile.block_url_patterns)) if profile.block_url_patterns else None
+
+    async def measure(navigation:dict, url:str):
+        try:
+            response = await context.request.head(url, timeout=5000)
+            navigation["bytes_saved"] += int(response.headers.get("content-length", 0))
+        except Exception:
+            pass
+
+    async def handle_route(route:Route, request:Request):
+        page = request_page(request)
+        if page is not None and request.is_navigation_request() and request.frame.parent_frame is None:
+            stats.start(page, request.url)
+        navigation = stats.navigation(page)
+        if navigation is not None:
+            navigation["requests"] += 1
+        if request.resource_type in block_types or (block_urls is not None and block_urls.search(request.url)):
+            if navigation is not None:
+                navigation["blocked"] += 1
+                if profile.measure_saved_bytes:
+                    task = asyncio.create_task(measure(navigation, request.url))
+                    stats.pending.add(task)
+                    task.add_done_callback(stats.pending.discard)
+            await route.abort()
+        else:
+            await route.fallback()
+
+    async def handle_finished(request:Request):
+        navigation = stats.navigation(request_page(request))
+        if navigation is None:
+            return
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        navigation["bytes"] += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+
+    def handle_load(page:Page):
+        navigation = stats.navigation(page)
+        if navigation is not None and navigation["load_time"] is None:
+            navigation["load_time"] = time.perf_counter() - navigation["start"]
+
+    def watch(page:Page):
+        page.on("requestfinished", handle_finished)
+        page.on("load", handle_load)
+
+    for page in context.pages:
+        watch(page)
+    context.on("page", watch)
+    await context.route("**/*", handle_route)
+    return stats
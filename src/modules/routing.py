@@ -0,0 +1,82 @@
+import json
+from langchain_core.messages import AIMessage
+from src.modules.struct import AgentState, RoutingConfig
+
+
+# Price in USD per million prompt and completion tokens.
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+
+def last_function_call(state:AgentState)->dict|None:
+    """Returns the function call of the last AI message in the scratchpad, or None."""
+    for message in reversed(state.get('scratchpad') or []):
+        if isinstance(message, AIMessage):
+            return message.additional_kwargs.get('function_call')
+    return None
+
+
+def classify(state:AgentState, config:RoutingConfig)->str:
+    """Decides which model tier takes the next step. Routine continuations go to the cheap tier: the last action was one of the cheap tools, the url is the same as at the previous step, and the page changed as expected. The first step, navigations, and steps where the action had no visible effect stay with the main tier.
+
+    Args:
+        state (AgentState): The state of the agent, after the observation of the page.
+        config (RoutingConfig): The routing config.
+
+    Returns:
+        str: 'cheap' or 'main'.
+    """
+    function_call = last_function_call(state)
+    if function_call is None or function_call['name'] not in config.cheap_tools:
+        return 'main'
+    if state.get('page_url') != state['page'].url or state.get('page_unchanged'):
+        return 'main'
+    return 'cheap'
+
+
+def is_valid_call(message:AIMessage, function_names:set)->bool:
+    """Whether a response calls one of the known functions with arguments which parse."""
+    function_call = message.additional_kwargs.get('function_call')
+    if not function_call or function_call.get('name') not in function_names:
+        return False
+    try:
+        json.loads(function_call.get('arguments') or '{}')
+    except ValueError:
+        return False
+    return True
+
+
+class TierStats:
+    """Counts the calls, the latency, the tokens and the cost of each model tier, and the escalations from the cheap tier to the main one"""
+
+    def __init__(self):
+        self.tiers = {}
+        self.escalations = 0
+
+    def record(self, tier:str, model:str, latency:float, message:AIMessage):
+        """Records one call of a tier.
+
+        Args:
+            tier (str): The tier, 'cheap' or 'main'.
+            model (str): The name of the model.
+            latency (float): The latency of the call in seconds.
+            message (AIMessage): The response, for its token usage.
+        """
+        usage = message.response_metadata.get('token_usage') or {}
+        prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+        stats = self.tiers.setdefault(tier, {"model": model, "calls": 0, "latency": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+        stats["calls"] += 1
+        stats["latency"] += latency
+        stats["prompt_tokens"] += usage.get('prompt_tokens', 0)
+        stats["completion_tokens"] += usage.get('completion_tokens', 0)
+        stats["cost"] += (usage.get('prompt_tokens', 0) * prompt_price + usage.get('completion_tokens', 0) * completion_price) / 1_000_000
+
+    def __str__(self)->str:
+        tiers = [
+            f"{tier} ({stats['model']}): {stats['calls']} calls, {stats['latency'] / stats['calls']:.2f}s mean latency, "
+            f"{stats['prompt_tokens'] + stats['completion_tokens']} tokens, ${stats['cost']:.4f}"
+            for tier, stats in sorted(self.tiers.items())
+        ]
+        return "; ".join(tiers + [f"{self.escalations} escalations"])
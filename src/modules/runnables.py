@@ -1,76 +1,306 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.runnables import chain
 from src.modules.helper import mark_page
-from src.modules.struct import AgentState, CompleteTask, OutputOrders
-from src.modules.helper import read_file
+from src.modules.struct import AgentState, CompleteTask, OutputOrders, ChangeDetectionConfig, CompactionConfig, DescriptionConfig
+from src.modules.compaction import compact
+from src.modules.descriptions import encode_descriptions
+from src.modules.change_detection import page_signature, is_same_page
+from src.modules.helper import read_resource
 from typing import Callable
 from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate, PromptTemplate, MessagesPlaceholder
 from langchain_core.prompts.image import ImagePromptTemplate
-from langchain_core.runnables import Runnable
-from src.modules.functions import click, type_text, scroll, wait, go_back, to_google, to_user
+from langchain_core.runnables import Runnable, RunnableConfig
+from src.modules.functions import click, type_text, scroll, wait, go_back, to_google, to_user, extract_orders, scroll_to_end, extract_order_details
+from src.modules.orders import merge_orders, coerce_order
+from src.modules.store import OrderStore
+from src.modules.llm_cache import cache_key
+from src.modules.routing import classify, is_valid_call
 import json
+import asyncio
+import time
+from contextlib import aclosing, nullcontext
+from functools import cache
 
 
 # <-------------------- AGENT RUNNABLES -------------------->
 
 @chain
 async def annotate(state: AgentState)->AgentState:
-    """Captures the screenshot of the page and annotates the elements on the page. Uses the mark_page helper function. To be used as a runnable inside the agent chain. All the relevant information is stored in the state.
+    """Captures the screenshot of the page and annotates the elements on the page. Uses the mark_page helper function, which encodes the screenshot as per the 'screenshot_config' in the state. To be used as a runnable inside the agent chain. All the relevant information is stored in the state.
 
     Args:
         state (AgentState): The state of the agent.
 
     Returns:
-        AgentState: The state of the agent with the annotated page screenshot and the bounding boxes.
+        AgentState: The state of the agent with the annotated page screenshot, its mime type and size in bytes, and the bounding boxes.
     """
-    marked_page = await mark_page.with_retry().ainvoke(state["page"])
+    marked_page = await mark_page.with_retry().ainvoke({
+        "page": state["page"],
+        "screenshot_config": state.get("screenshot_config"),
+    })
     return {**state, **marked_page}
 
 
 @chain
 def format_descriptions(state: AgentState)->AgentState:
-    """Formats the descriptions of the bounding boxes and returns the state with the formatted descriptions. To be used as a runnable inside the agent chain. All the relevant information is stored in the state.
+    """Formats the descriptions of the bounding boxes as per the 'descriptions' config in the state, and returns the state with the formatted descriptions. The bounding boxes are kept as 'previous_bboxes' for the delta mode of the next step. To be used as a runnable inside the agent chain. All the relevant information is stored in the state.
 
     Args:
         state (AgentState): The state of the agent.
 
     Returns:
-        AgentState: The state of the agent with the formatted descriptions of the bounding boxes.
+        AgentState: The state of the agent with the formatted descriptions of the bounding boxes, and the estimated number of tokens saved by the compact format.
     """
-    labels = []
-    for i, bbox in enumerate(state["bboxes"]):
-        text = bbox.get("ariaLabel","")
-        if not text.strip():
-            text = bbox["text"]
-        el_type = bbox.get("type","")
-        labels.append(f'{i} (<{el_type}/>): "{text}"')
-    bbox_descriptions = "Valid Bounding Boxes:\n" + "\n".join(labels)
-    return {**state, "bbox_descriptions": bbox_descriptions}
+    config = state.get("descriptions") or DescriptionConfig()
+    bbox_descriptions, tokens_saved = encode_descriptions(state["bboxes"], state.get("previous_bboxes"), config)
+    return {**state, "bbox_descriptions": bbox_descriptions, "previous_bboxes": state["bboxes"], "description_tokens_saved": tokens_saved}
 
 
-system_prompt = read_file("src/prompts/system_prompt.txt")
+@chain
+async def detect_change(state: AgentState, config: RunnableConfig)->AgentState:
+    """Compares the current observation with the previous one, using the perceptual hash of the screenshot and the digest of the bounding boxes. To be used as a runnable inside the agent chain, after annotate. All the relevant information is stored in the state. If a ChangeStats is passed as 'change_stats' in the configurable of the run config, the observation is counted in it.
+
+    Args:
+        state (AgentState): The state of the agent.
+        config (RunnableConfig): The run config.
+
+    Returns:
+        AgentState: The state of the agent with the signature of the current observation and whether the page is unchanged.
+    """
+    detection = state.get("change_detection") or ChangeDetectionConfig()
+    if detection.policy == "off":
+        return {**state, "page_unchanged": False}
+    signature = await asyncio.to_thread(page_signature, state["img"], state["bboxes"])
+    unchanged = is_same_page(state.get("page_signature"), signature, detection.max_distance)
+    change_stats = config.get('configurable', {}).get('change_stats')
+    if change_stats is not None:
+        change_stats.record(unchanged)
+    return {**state, "page_signature": signature, "page_unchanged": unchanged}
+
 
+@chain
+def compact_scratchpad(state: AgentState)->AgentState:
+    """Compacts the scratchpad to the token budget of the 'compaction' config in the state. Recent turns are kept verbatim and older turns are folded into a rolling summary. The compacted scratchpad only replaces the full one in the prompt, the graph state keeps every message. To be used as a runnable inside the agent chain.
+
+    Args:
+        state (AgentState): The state of the agent.
+
+    Returns:
+        AgentState: The state of the agent with the compacted scratchpad and the updated rolling summary.
+    """
+    config = state.get("compaction") or CompactionConfig()
+    messages, summary, summarized = compact(
+        state.get("scratchpad") or [],
+        state.get("scratchpad_summary") or {},
+        state.get("summarized_messages") or 0,
+        config,
+    )
+    return {**state, "scratchpad": messages, "scratchpad_summary": summary, "summarized_messages": summarized}
 
-prompt = ChatPromptTemplate.from_messages([
-    SystemMessagePromptTemplate.from_template(system_prompt),
-    HumanMessagePromptTemplate.from_template('{input}'),
-    MessagesPlaceholder(variable_name='scratchpad', optional=True),
-    HumanMessagePromptTemplate(prompt=[
-        ImagePromptTemplate(input_variables=['img'], template={'url': 'data:image/png;base64,{img}'}),
-        PromptTemplate(input_variables=['bbox_descriptions'], template='{bbox_descriptions}'),
+
+# The last human message of the prompt for each kind of observation. The screenshot is only sent with a new observation.
+observation_templates = {
+    'unchanged': 'The page has not changed since the previous observation, so the screenshot is not repeated.\n{bbox_descriptions}',
+    'text_only': 'The page changed as expected after your last action. The screenshot is left out for this routine step, continue from the descriptions of the elements.\n{bbox_descriptions}',
+}
+
+
+@cache
+def get_prompt(observation:str='screenshot')->ChatPromptTemplate:
+    """Builds the prompt of the agent on first use. The system prompt is read from the package.
+
+    Args:
+        observation (str, optional): How the page is observed: 'screenshot' sends the screenshot with the descriptions of the bounding boxes, 'unchanged' tells the model that the page has not changed, and 'text_only' only sends the descriptions for a routine step. Defaults to 'screenshot'.
+
+    Returns:
+        ChatPromptTemplate: The prompt.
+    """
+    if observation == 'screenshot':
+        observation_message = HumanMessagePromptTemplate(prompt=[
+            ImagePromptTemplate(input_variables=['img_mime', 'img'], template={'url': 'data:{img_mime};base64,{img}'}),
+            PromptTemplate(input_variables=['bbox_descriptions'], template='{bbox_descriptions}'),
+        ])
+    else:
+        observation_message = HumanMessagePromptTemplate.from_template(observation_templates[observation])
+    return ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(read_resource("prompts/system_prompt.txt")),
+        HumanMessagePromptTemplate.from_template('{input}'),
+        MessagesPlaceholder(variable_name='scratchpad', optional=True),
+        observation_message,
     ])
-])
 
 
-functions_list = [click, type_text, scroll, wait, go_back, to_google, to_user]
-llm = ChatOpenAI(model="gpt-4o", max_tokens=4096).bind_functions(functions_list+[CompleteTask,OutputOrders])
+functions_list = [click, type_text, scroll, scroll_to_end, wait, go_back, to_google, to_user, extract_orders, extract_order_details]
+function_names = {function.__name__ for function in functions_list+[CompleteTask,OutputOrders]}
+model_name = "gpt-4o"
+
+
+@cache
+def get_llm(name:str=model_name)->Runnable:
+    """Returns the llm of the given OpenAI model, bound to the functions of the agent. The OpenAI client is imported and created on first use, so that importing the graph stays fast.
+
+    Args:
+        name (str, optional): The OpenAI model. Defaults to the main model, gpt-4o.
+
+    Returns:
+        Runnable: The llm.
+    """
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=name, max_tokens=4096).bind_functions(functions_list+[CompleteTask,OutputOrders])
+
+
+def llm_name(model:Runnable)->str:
+    """Returns the model name of an llm, or the name of the runnable which replaces it."""
+    return getattr(getattr(model, 'bound', model), 'model_name', None) or model.get_name()
+
+
+async def stream_llm(model:Runnable, prompt_value, config: RunnableConfig, on_token:Callable)->AIMessage:
+    """Streams the completion of the llm, passing every piece of text to on_token as it arrives. The stream is closed as soon as the arguments of the function call parse, so the tool can run without waiting for the rest of the response.
+
+    Args:
+        model (Runnable): The llm to stream from.
+        prompt_value: The formatted prompt.
+        config (RunnableConfig): The run config.
+        on_token (Callable): Called with every piece of text of the response.
+
+    Returns:
+        AIMessage: The response of the llm. It has no token usage if the stream was closed early.
+    """
+    message = None
+    async with aclosing(model.astream(prompt_value, config)) as stream:
+        async for chunk in stream:
+            message = chunk if message is None else message + chunk
+            if isinstance(chunk.content, str) and chunk.content:
+                on_token(chunk.content)
+            function_call = message.additional_kwargs.get('function_call') or {}
+            if function_call.get('name') and function_call.get('arguments'):
+                try:
+                    json.loads(function_call['arguments'])
+                except ValueError:
+                    continue
+                break
+    if message is None:
+        return AIMessage(content="")
+    return AIMessage(content=message.content, additional_kwargs=message.additional_kwargs, response_metadata=message.response_metadata, id=message.id)
+
+
+@chain
+async def call_llm(prompt_value, config: RunnableConfig)->AIMessage:
+    """Calls the llm with the formatted prompt. If an asyncio.Semaphore is passed as 'llm_semaphore' in the configurable of the run config, the call waits for it, so that sessions sharing the semaphore have a bounded number of llm calls in flight. If a Cassette is passed as 'cassette', the call is recorded, or served from the cassette without calling the llm in replay mode. If an LLMCache is passed as 'llm_cache', identical prompts are served from the cache, unless one of the kinds passed as 'llm_call_kinds', like the routing tier and the observation of the prompt, opted out of it. If a callable is passed as 'on_token', the response is streamed into it with stream_llm. A runnable passed as 'llm' replaces the llm, like the scripted model of the benchmarks.
+
+    Args:
+        prompt_value: The formatted prompt.
+        config (RunnableConfig): The run config.
+
+    Returns:
+        AIMessage: The response of the llm.
+    """
+    configurable = config.get('configurable', {})
+    cassette = configurable.get('cassette')
+    if cassette is not None and cassette.mode == 'replay':
+        return cassette.replay_llm(prompt_value)
+
+    model = configurable.get('llm') or get_llm()
+    cache = configurable.get('llm_cache')
+    key = None
+    if cache is not None and cache.enabled_for(configurable.get('llm_call_kinds') or ()):
+        key = cache_key(prompt_value, llm_name(model), **getattr(model, 'kwargs', {}))
+        result = await asyncio.to_thread(cache.get, key)
+    if key is None or result is None:
+        on_token = configurable.get('on_token')
+        semaphore = configurable.get('llm_semaphore') or nullcontext()
+        async with semaphore:
+            if on_token is None:
+                result = await model.ainvoke(prompt_value, config)
+            else:
+                result = await stream_llm(model, prompt_value, config, on_token)
+        # Only responses with a function call are cached, so that a bad response is not served again.
+        if key is not None and result.additional_kwargs.get('function_call'):
+            await asyncio.to_thread(cache.put, key, result)
+
+    if cassette is not None:
+        cassette.record_llm(prompt_value, result)
+    return result
+
+
+def last_decision(state:AgentState)->AIMessage|None:
+    """Returns the last tool call of the agent which can be repeated as is. Saving the orders and completing the task are never repeated.
+
+    Args:
+        state (AgentState): The state of the agent.
+
+    Returns:
+        AIMessage|None: The last AI message with a function call, or None.
+    """
+    for message in reversed(state.get('scratchpad') or []):
+        if isinstance(message, AIMessage) and message.additional_kwargs.get('function_call'):
+            if message.additional_kwargs['function_call']['name'] in (OutputOrders.__name__, CompleteTask.__name__):
+                return None
+            return message
+    return None
 
 
-def create_agent_with_prompt(runnable:Runnable)->Callable:
+def create_agent_with_prompt(runnable:Runnable, no_change_runnable:Runnable|None=None, text_only_runnable:Runnable|None=None)->Callable:
     @chain
-    async def func(state:AgentState)->AgentState:
-        result = await runnable.ainvoke(state)
+    async def func(state:AgentState, config:RunnableConfig)->AgentState:
+        page_url = state['page'].url
+        macros = config.get('configurable', {}).get('macros')
+        change_stats = config.get('configurable', {}).get('change_stats')
+        tier_stats = config.get('configurable', {}).get('tier_stats')
+        if macros is not None:
+            message = macros.replay(page_url, state['bboxes'])
+            if message is not None:
+                return {**state, 'scratchpad': [message], 'unchanged_streak': 0, 'prompt_tokens': 0, 'page_url': page_url}
+
+        routing = state.get('routing')
+        tier = 'main'
+        if state.get('page_unchanged'):
+            detection = state.get('change_detection') or ChangeDetectionConfig()
+            streak = state.get('unchanged_streak') or 0
+            previous = last_decision(state)
+            if detection.policy == 'reuse' and streak < detection.max_reuse and previous is not None:
+                if change_stats is not None:
+                    change_stats.calls_saved += 1
+                message = AIMessage(content="The page has not changed. Repeating my previous action.", additional_kwargs=previous.additional_kwargs)
+                return {**state, 'scratchpad': [message], 'unchanged_streak': streak + 1, 'prompt_tokens': 0, 'page_url': page_url}
+            if no_change_runnable is not None:
+                if change_stats is not None:
+                    change_stats.images_saved += 1
+                runnable_to_call = no_change_runnable
+            else:
+                runnable_to_call = runnable
+        elif routing is not None and classify(state, routing) == 'cheap':
+            tier = 'cheap'
+            runnable_to_call = text_only_runnable if routing.text_only and text_only_runnable is not None else runnable
+        else:
+            runnable_to_call = runnable
+
+        async def invoke(tier:str, runnable_to_call:Runnable)->AIMessage:
+            # A runnable passed as 'llm' in the configurable, like the scripted model of the benchmarks, serves both tiers. The main llm is left to call_llm, and the cheap one is only created on its first call outside of a replay, so that replays never create them.
+            configurable = config.get('configurable', {})
+            cassette = configurable.get('cassette')
+            replay = cassette is not None and cassette.mode == 'replay'
+            # The tier and the observation of the prompt let the llm cache leave kinds of calls out.
+            observation = 'unchanged' if runnable_to_call is no_change_runnable else 'text_only' if runnable_to_call is text_only_runnable else 'screenshot'
+            tier_configurable = {**configurable, 'llm_call_kinds': (tier, observation)}
+            if tier == 'cheap' and not configurable.get('llm') and not replay:
+                tier_configurable['llm'] = get_llm(routing.cheap_model)
+            tier_config = {**config, 'configurable': tier_configurable}
+            model = tier_configurable.get('llm')
+            start = time.perf_counter()
+            result = await runnable_to_call.ainvoke(state, tier_config)
+            if tier_stats is not None:
+                name = llm_name(model) if model is not None else routing.cheap_model if tier == 'cheap' else model_name
+                tier_stats.record(tier, name, time.perf_counter() - start, result)
+            return result
+
+        result = await invoke(tier, runnable_to_call)
+        if tier == 'cheap' and not is_valid_call(result, function_names):
+            # The cheap model returned no call, an unknown one or broken arguments. The step is escalated to the main model, with the screenshot.
+            if tier_stats is not None:
+                tier_stats.escalations += 1
+            result = await invoke('main', runnable)
+
         if not result.tool_calls and (
             not result.content
             or isinstance(result.content,list)
@@ -78,15 +308,29 @@ def create_agent_with_prompt(runnable:Runnable)->Callable:
         ):
             messages = [AIMessage(content="Seems like my last response did not have any tool calls or content. I need to check my response", additional_kwargs={})]
             print(f"This was the invokation result:\n{result}")
-            return {**state, 'scratchpad': messages}
+            return {**state, 'scratchpad': messages, 'unchanged_streak': 0, 'page_url': page_url}
         
         else:
-            return {**state, 'scratchpad': [result]}
+            prompt_tokens = (result.response_metadata.get('token_usage') or {}).get('prompt_tokens', 0)
+            if macros is not None:
+                macros.record(page_url, result, state['bboxes'])
+            return {**state, 'scratchpad': [result], 'unchanged_streak': 0, 'prompt_tokens': prompt_tokens, 'page_url': page_url}
     return func
 
 
-agent = create_agent_with_prompt(runnable = prompt|llm)
-agent_chain = annotate | format_descriptions | agent
+@cache
+def get_agent_chain()->Runnable:
+    """Builds the agent chain on first use: the observation of the page, the change detection, the descriptions, the compaction and the agent.
+
+    Returns:
+        Runnable: The agent chain, to be used as the agent node of the graph.
+    """
+    agent = create_agent_with_prompt(
+        runnable = get_prompt('screenshot')|call_llm,
+        no_change_runnable = get_prompt('unchanged')|call_llm,
+        text_only_runnable = get_prompt('text_only')|call_llm,
+    )
+    return annotate | detect_change | format_descriptions | compact_scratchpad | agent
 
 
 # <-------------------- HELPER RUNNABLES -------------------->
@@ -124,7 +368,7 @@ async def type_text_node(state: AgentState)->dict:
         dict: The result of the type_text function.
     """
     message = state['scratchpad'][-1]
-    ai_kwargs = eval(message.additional_kwargs['function_call']['arguments'])
+    ai_kwargs = json.loads(message.additional_kwargs['function_call']['arguments'] or '{}')
     state_kwargs = {
         'page': state['page'],
         'bboxes': state['bboxes']
@@ -144,7 +388,7 @@ async def click_node(state: AgentState)->dict:
         dict: The result of the click function.
     """
     message = state['scratchpad'][-1]
-    ai_kwargs = eval(message.additional_kwargs['function_call']['arguments'])
+    ai_kwargs = json.loads(message.additional_kwargs['function_call']['arguments'] or '{}')
     state_kwargs = {
         'page': state['page'],
         'bboxes': state['bboxes']
@@ -164,7 +408,7 @@ async def scroll_node(state: AgentState)->dict:
         dict: The result of the scroll function.
     """
     message = state['scratchpad'][-1]
-    ai_kwargs = eval(message.additional_kwargs['function_call']['arguments'])
+    ai_kwargs = json.loads(message.additional_kwargs['function_call']['arguments'] or '{}')
     state_kwargs = {
         'page': state['page'],
         'bboxes': state['bboxes']
@@ -173,6 +417,40 @@ async def scroll_node(state: AgentState)->dict:
     return result
 
 
+@chain
+async def scroll_to_end_node(state: AgentState)->dict:
+    """This is the node executable for the scroll_to_end tool. It will be used as a node in the graph, which will call the scroll_to_end function when the agent requires it. The orders found while scrolling are merged into the orders in the state and saved in the order store right away.
+
+    Args:
+        state (AgentState): The state of the agent.
+
+    Returns:
+        dict: The result of the scroll_to_end function.
+    """
+    message = state['scratchpad'][-1]
+    ai_kwargs = json.loads(message.additional_kwargs['function_call']['arguments'] or '{}')
+    result = await scroll_to_end(page=state['page'], **ai_kwargs)
+    if result.get('orders'):
+        await save_orders(state, result['orders'])
+    return result
+
+
+@chain
+async def wait_node(state: AgentState)->dict:
+    """This is the node executable for the wait tool. It will be used as a node in the graph, which will call the wait function when the agent requires it.
+
+    Args:
+        state (AgentState): The state of the agent.
+
+    Returns:
+        dict: The result of the wait function.
+    """
+    message = state['scratchpad'][-1]
+    ai_kwargs = json.loads(message.additional_kwargs['function_call']['arguments'] or '{}')
+    result = await wait(page=state['page'], **ai_kwargs)
+    return result
+
+
 @chain
 async def go_back_node(state: AgentState)->dict:
     """This is the node executable for the go_back tool. It will be used as a node in the graph, which will call the go_back function when the agent requires it.
@@ -201,9 +479,57 @@ async def to_google_node(state: AgentState)->dict:
     return result
 
 
+async def save_orders(state: AgentState, orders:list)->int:
+    """Upserts the orders into the order store at the 'order_store' path of the state, 'orders.db' by default.
+
+    Args:
+        state (AgentState): The state of the agent.
+        orders (list): The orders to save.
+
+    Returns:
+        int: The number of orders which were new to the store.
+    """
+    store = OrderStore(state.get('order_store') or 'orders.db')
+    return await asyncio.to_thread(store.upsert, orders)
+
+
+@chain
+async def extract_orders_node(state: AgentState)->dict:
+    """This is the node executable for the extract_orders tool. It will be used as a node in the graph, which will call the extract_orders function when the agent requires it. The extracted orders are merged into the orders in the state and saved in the order store right away.
+
+    Args:
+        state (AgentState): The state of the agent.
+
+    Returns:
+        dict: The result of the extract_orders function.
+    """
+    result = await extract_orders(state['page'])
+    if result.get('orders'):
+        await save_orders(state, result['orders'])
+    return result
+
+
+@chain
+async def extract_order_details_node(state: AgentState)->dict:
+    """This is the node executable for the extract_order_details tool. It will be used as a node in the graph, which will call the extract_order_details function when the agent requires it. The orders with their details are merged into the orders in the state and saved in the order store right away.
+
+    Args:
+        state (AgentState): The state of the agent.
+
+    Returns:
+        dict: The result of the extract_order_details function.
+    """
+    message = state['scratchpad'][-1]
+    ai_kwargs = json.loads(message.additional_kwargs['function_call']['arguments'] or '{}')
+    result = await extract_order_details(page=state['page'], **ai_kwargs)
+    if result.get('orders'):
+        await save_orders(state, result['orders'])
+    return result
+
+
 @chain
 async def structure_orders(state: AgentState)->dict:
-    """This is the node executable for the structure_orders tool. It will be used as a node in the graph, which will call the structure_orders function when the agent requires it.
+    """This is the node executable for the structure_orders tool. It will be used as a node in the graph, which will call the structure_orders function when the agent requires it. The orders passed by the agent are saved in the order store, next to the orders extracted from the page content, and the store is exported to the 'orders_export' path of the state, 'orders.json' by default. The orders of the agent which have no name, price or valid delivery status are skipped and listed in the tool output. If the arguments do not parse, like when a long list of orders was cut off by the token limit of the response, nothing is saved and the agent is asked to pass the orders again in smaller batches. The orders saved in the store so far are kept.
 
     Args:
         state (AgentState): The state of the agent.
@@ -212,23 +538,42 @@ async def structure_orders(state: AgentState)->dict:
         dict: The result of the structure_orders function.
     """
     message = state.get('scratchpad')[-1]
-    orders = eval(message.additional_kwargs['function_call']['arguments'])
-    with open('orders.json','w') as f:
-        json.dump(orders,f)
-    return {'tool_output': 'Orders saved successfully'}
+    try:
+        arguments = json.loads(message.additional_kwargs['function_call']['arguments'] or '{}')
+    except ValueError:
+        arguments = None
+    if not isinstance(arguments, dict) or not isinstance(arguments.get('orders') or [], list):
+        return {'tool_output': f"The arguments of {OutputOrders.__name__} could not be read, they may have been cut off. No orders were saved by this call, the {len(state.get('orders') or [])} orders extracted so far are kept. Call {OutputOrders.__name__} again with the remaining orders in smaller batches of at most 50 orders."}
+    passed = arguments.get('orders') or []
+    valid = [coerce_order(order) for order in passed]
+    skipped = [order for order, coerced in zip(passed, valid) if coerced is None]
+    orders = merge_orders(state.get('orders') or [], [order for order in valid if order is not None])
+    await save_orders(state, orders)
+    store = OrderStore(state.get('order_store') or 'orders.db')
+    count = await asyncio.to_thread(store.export_json, state.get('orders_export') or 'orders.json')
+    tool_output = f"{len(orders)} orders of this run saved successfully, {count} orders in total"
+    if skipped:
+        tool_output += f". {len(skipped)} orders were skipped because their name, price or delivery status could not be read: {json.dumps(skipped, ensure_ascii=False)[:1000]}"
+    return {'tool_output': tool_output, 'orders': orders}
 
 
 @chain
-async def to_user_node(state: AgentState)->dict:
-    """This is the node executable for the to_user tool. It will be used as a node in the graph, which will call the to_user function when the agent requires it.
+async def to_user_node(state: AgentState, config: RunnableConfig)->dict:
+    """This is the node executable for the to_user tool. It will be used as a node in the graph, which will call the to_user function when the agent requires it. If a Cassette is passed as 'cassette' in the configurable of the run config, the response of the user is recorded, or served from the cassette in replay mode.
 
     Args:
         state (AgentState): The state of the agent.
+        config (RunnableConfig): The run config.
 
     Returns:
         dict: The result of the to_user function.
     """
+    cassette = config.get('configurable', {}).get('cassette')
+    if cassette is not None and cassette.mode == 'replay':
+        return {'tool_output': cassette.replay_user()}
     message = state['scratchpad'][-1]
-    ai_kwargs = eval(message.additional_kwargs['function_call']['arguments'])
+    ai_kwargs = json.loads(message.additional_kwargs['function_call']['arguments'] or '{}')
     response = await to_user(ai_kwargs)
-    return response
\ No newline at end of file
+    if cassette is not None:
+        cassette.record_user(response['tool_output'])
+    return response
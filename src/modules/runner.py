@@ -0,0 +1,154 @@
+from typing import Sequence, TypedDict
+import asyncio
+import json
+import sys
+import time
+from playwright.async_api import async_playwright, Browser
+from langgraph.graph.state import CompiledStateGraph
+from src.modules.helper import install_mark_page, read_resource
+from src.modules.auth import new_context, open_logged_in, confirm_login, save_storage_state, FLIPKART_ORDERS_URL
+
+
+class Session(TypedDict, total=False):
+    """Defines one agent run of the concurrent runner"""
+    name: str
+    question: str
+    start_url: str
+    storage_state: str
+    state: dict
+    context_kwargs: dict
+
+
+class SessionStats(TypedDict):
+    """Defines the throughput statistics of one session"""
+    name: str
+    steps: int
+    llm_steps: int
+    wall_time: float
+    steps_per_second: float
+    error: str
+
+
+async def run_session(browser: Browser, graph: CompiledStateGraph, session: Session, contexts: asyncio.Semaphore, llm_semaphore: asyncio.Semaphore, max_steps:int)->SessionStats:
+    """Runs one session in its own browser context, once a slot in the context pool is free. If the session has a usable saved login, it starts logged in on its start url, and its login is saved again after a successful run.
+
+    Args:
+        browser (Browser): The shared browser.
+        graph (CompiledStateGraph): The compiled state graph, shared by all the sessions.
+        session (Session): The session to run.
+        contexts (asyncio.Semaphore): Bounds the number of open browser contexts.
+        llm_semaphore (asyncio.Semaphore): Bounds the number of llm calls in flight across all the sessions.
+        max_steps (int): The maximum number of steps of the session.
+
+    Returns:
+        SessionStats: The statistics of the session.
+    """
+    async with contexts:
+        context, restored = await new_context(browser, session.get("storage_state"), **session.get("context_kwargs", {}))
+        steps, llm_steps, error = 0, 0, ""
+        start = time.perf_counter()
+        try:
+            await install_mark_page(context)
+            page = await context.new_page()
+            question = session["question"]
+            if restored and await open_logged_in(page, session.get("start_url") or FLIPKART_ORDERS_URL):
+                question = read_resource("prompts/logged_in_prompt.txt") + question
+            else:
+                await page.goto(session.get("start_url") or "https://www.google.com")
+            event_stream = graph.astream(
+                input = {
+                    'page':page,
+                    'input':question,
+                    'scratchpad':[],
+                    **session.get("state", {}),
+                },
+                config={
+                    'recursion_limit':max_steps,
+                    'configurable':{'llm_semaphore':llm_semaphore},
+                }
+            )
+            async for event in event_stream:
+                steps += 1
+                llm_steps += int("agent" in event)
+            if session.get("storage_state") and await confirm_login(context):
+                await save_storage_state(context, session["storage_state"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            wall_time = time.perf_counter() - start
+            await context.close()
+    return SessionStats(
+        name=session.get("name", session["question"][:30]),
+        steps=steps,
+        llm_steps=llm_steps,
+        wall_time=wall_time,
+        steps_per_second=steps / wall_time if wall_time else 0.0,
+        error=error,
+    )
+
+
+async def run_sessions(sessions: Sequence[Session], graph: CompiledStateGraph, browser: Browser, concurrency:int=4, llm_concurrency:int=4, max_steps:int=300)->list:
+    """Runs many sessions concurrently on one event loop and one browser. Every session gets its own isolated browser context, and at most `concurrency` contexts are open at once.
+
+    Args:
+        sessions (Sequence[Session]): The sessions to run.
+        graph (CompiledStateGraph): The compiled state graph.
+        browser (Browser): The browser to open the contexts in.
+        concurrency (int, optional): The maximum number of sessions running at once. Defaults to 4.
+        llm_concurrency (int, optional): The maximum number of llm calls in flight at once. Defaults to 4.
+        max_steps (int, optional): The maximum number of steps of every session. Defaults to 300.
+
+    Returns:
+        list: The SessionStats of every session, in the order of the sessions.
+    """
+    contexts = asyncio.Semaphore(concurrency)
+    llm_semaphore = asyncio.Semaphore(llm_concurrency)
+    return await asyncio.gather(*[
+        run_session(browser, graph, session, contexts, llm_semaphore, max_steps)
+        for session in sessions
+    ])
+
+
+def print_stats(stats: Sequence[SessionStats], wall_time:float):
+    """Prints the per session and the aggregate throughput.
+
+    Args:
+        stats (Sequence[SessionStats]): The statistics of every session.
+        wall_time (float): The wall time of the whole run in seconds.
+    """
+    print(f"{'session':<30} {'steps':>6} {'llm':>5} {'time s':>8} {'steps/s':>8}  error")
+    for stat in stats:
+        print(f"{stat['name']:<30} {stat['steps']:>6} {stat['llm_steps']:>5} {stat['wall_time']:>8.1f} {stat['steps_per_second']:>8.2f}  {stat['error']}")
+    total_steps = sum(stat['steps'] for stat in stats)
+    print(
+        f"\n{len(stats)} sessions, {total_steps} steps in {wall_time:.1f}s: "
+        f"{total_steps / wall_time if wall_time else 0:.2f} steps/s, "
+        f"{len(stats) / wall_time * 60 if wall_time else 0:.2f} sessions/min"
+    )
+
+
+async def main(sessions_path:str, concurrency:int, llm_concurrency:int):
+    """Runs the sessions listed in a JSON file with the flipkart scraper graph and prints the throughput.
+
+    Args:
+        sessions_path (str): The path to a JSON file with a list of sessions.
+        concurrency (int): The maximum number of sessions running at once.
+        llm_concurrency (int): The maximum number of llm calls in flight at once.
+    """
+    from src.modules.graph import get_graph
+
+    with open(sessions_path) as f:
+        sessions = json.load(f)
+    graph = get_graph()
+    async with async_playwright() as p:
+        browser = await p.firefox.launch(headless=False, args=None)
+        start = time.perf_counter()
+        stats = await run_sessions(sessions, graph, browser, concurrency, llm_concurrency)
+        print_stats(stats, time.perf_counter() - start)
+        await browser.close()
+
+
+if __name__=="__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    asyncio.run(main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 4, int(sys.argv[3]) if len(sys.argv) > 3 else 4))
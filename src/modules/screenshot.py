@@ -0,0 +1,80 @@
+from typing import Sequence, Optional
+import base64
+from io import BytesIO
+from PIL import Image
+from src.modules.struct import BBox, ScreenshotConfig
+
+
+def bboxes_clip(bboxes:Sequence[BBox], viewport:dict, margin:int=0)->Optional[dict]:
+    """Computes the region of the viewport covered by the bounding boxes.
+
+    Args:
+        bboxes (Sequence[BBox]): The list of bounding boxes on the page.
+        viewport (dict): The viewport size, with keys 'width' and 'height'.
+        margin (int, optional): Margin in pixels added around the region. Defaults to 0.
+
+    Returns:
+        Optional[dict]: The clip region with keys 'x', 'y', 'width' and 'height', as expected by `page.screenshot`. None if there are no bounding boxes.
+    """
+    if not bboxes:
+        return None
+    left = min(bbox["x"] - bbox.get("width", 0) / 2 for bbox in bboxes) - margin
+    top = min(bbox["y"] - bbox.get("height", 0) / 2 for bbox in bboxes) - margin
+    right = max(bbox["x"] + bbox.get("width", 0) / 2 for bbox in bboxes) + margin
+    bottom = max(bbox["y"] + bbox.get("height", 0) / 2 for bbox in bboxes) + margin
+    left, top = max(0, left), max(0, top)
+    right, bottom = min(viewport["width"], right), min(viewport["height"], bottom)
+    if right <= left or bottom <= top:
+        return None
+    return {"x": left, "y": top, "width": right - left, "height": bottom - top}
+
+
+def needs_reencoding(config:ScreenshotConfig)->bool:
+    """Whether the screenshot has to be re-encoded after capture. Playwright can capture png and jpeg directly, but cannot resize or produce webp.
+
+    Args:
+        config (ScreenshotConfig): The screenshot encoding config.
+
+    Returns:
+        bool: True if the screenshot has to go through `encode_screenshot`.
+    """
+    return config.width is not None or config.format == "webp"
+
+
+def encode_screenshot(screenshot:bytes, config:ScreenshotConfig)->bytes:
+    """Downscales and re-encodes a captured screenshot as per the config.
+
+    Args:
+        screenshot (bytes): The captured screenshot, in any format supported by Pillow.
+        config (ScreenshotConfig): The screenshot encoding config.
+
+    Returns:
+        bytes: The encoded screenshot.
+    """
+    image = Image.open(BytesIO(screenshot))
+    if config.width is not None and image.width > config.width:
+        height = round(image.height * config.width / image.width)
+        image = image.resize((config.width, height), Image.LANCZOS)
+    output = BytesIO()
+    if config.format == "png":
+        image.save(output, format="PNG", optimize=True)
+    else:
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(output, format=config.format.upper(), quality=config.quality)
+    return output.getvalue()
+
+
+def encode_for_prompt(screenshot:bytes, config:ScreenshotConfig)->tuple[bytes, str]:
+    """Re-encodes the captured screenshot if the config needs it, and encodes it as base64 for the prompt.
+
+    Args:
+        screenshot (bytes): The captured screenshot.
+        config (ScreenshotConfig): The screenshot encoding config.
+
+    Returns:
+        tuple[bytes, str]: The encoded screenshot and its base64 text.
+    """
+    if needs_reencoding(config):
+        screenshot = encode_screenshot(screenshot, config)
+    return screenshot, base64.b64encode(screenshot).decode()
@@ -0,0 +1,127 @@
+from typing import Sequence, Iterator, Optional
+import json
+import sqlite3
+import time
+from contextlib import closing
+from src.modules.struct import Order
+from src.modules.orders import order_key, normalize_name, coerce_order
+
+
+# The optional columns of the OrderDetails fields.
+DETAIL_COLUMNS = {"order_id": "TEXT", "item_id": "TEXT", "order_date": "TEXT", "seller": "TEXT", "item_count": "INTEGER"}
+
+
+class OrderStore:
+    """Append-only SQLite store of the extracted orders. Orders are upserted by their order_key, so saving the same order again, in the same run or in a later one, only updates its delivery status and fills in the order details it did not have. Orders with and without an order id are matched like in merge_orders."""
+
+    def __init__(self, path:str="orders.db"):
+        self.path = path
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS orders ("
+                " key TEXT PRIMARY KEY,"
+                " normalized_name TEXT NOT NULL,"
+                " product_name TEXT NOT NULL,"
+                " product_price INTEGER NOT NULL,"
+                " delivery_status INTEGER NOT NULL,"
+                " first_seen REAL NOT NULL,"
+                " last_seen REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS orders_name_price ON orders (normalized_name, product_price)")
+            # Stores created before the order details were extracted get their columns added.
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(orders)")}
+            for column, column_type in DETAIL_COLUMNS.items():
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE orders ADD COLUMN {column} {column_type}")
+
+    def connect(self)->sqlite3.Connection:
+        """Opens a new connection to the store. Connections are not shared, so that the store can be used from worker threads."""
+        return sqlite3.connect(self.path)
+
+    def find(self, connection:sqlite3.Connection, order:Order)->Optional[int]:
+        """Returns the rowid of the stored order which is the same as the given one, or None if it is new. An order without an id is the same as a stored order with the same name and price, and an order with an id is the same as a stored one without an id with the same name and price.
+
+        Args:
+            connection (sqlite3.Connection): The connection of the transaction.
+            order (Order): The order to look up.
+
+        Returns:
+            Optional[int]: The rowid of the stored order.
+        """
+        row = connection.execute("SELECT rowid FROM orders WHERE key = ?", (order_key(order),)).fetchone()
+        if row is None:
+            query = "SELECT rowid FROM orders WHERE normalized_name = ? AND product_price = ?"
+            if order.get("order_id"):
+                query += " AND order_id IS NULL"
+            row = connection.execute(query + " ORDER BY first_seen, rowid LIMIT 1", (normalize_name(order["product_name"]), order["product_price"])).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, orders:Sequence[Order])->int:
+        """Saves a batch of orders in one transaction. New orders are inserted, known ones get their delivery status and last seen time updated, and their order details filled in. The fields are coerced with coerce_order, and the orders which are not valid are skipped.
+
+        Args:
+            orders (Sequence[Order]): The orders to save.
+
+        Returns:
+            int: The number of orders which were not in the store before.
+        """
+        now = time.time()
+        inserted = 0
+        orders = [order for order in map(coerce_order, orders) if order is not None]
+        with closing(self.connect()) as connection, connection:
+            for order in orders:
+                details = [order.get(column) for column in DETAIL_COLUMNS]
+                rowid = self.find(connection, order)
+                if rowid is None:
+                    connection.execute(
+                        f"INSERT INTO orders (key, normalized_name, product_name, product_price, delivery_status, first_seen, last_seen, {', '.join(DETAIL_COLUMNS)})"
+                        f" VALUES (?, ?, ?, ?, ?, ?, ?, {', '.join('?' for _ in DETAIL_COLUMNS)})",
+                        (order_key(order), normalize_name(order["product_name"]), order["product_name"], order["product_price"], order["delivery_status"], now, now, *details),
+                    )
+                    inserted += 1
+                else:
+                    # A stored order without an id takes the key of the order id once it is known.
+                    connection.execute(
+                        "UPDATE orders SET key = COALESCE(?, key), delivery_status = ?, last_seen = ?, "
+                        f"{', '.join(f'{column} = COALESCE(?, {column})' for column in DETAIL_COLUMNS)} WHERE rowid = ?",
+                        (order_key(order) if order.get("order_id") else None, order["delivery_status"], now, *details, rowid),
+                    )
+        return inserted
+
+    def __len__(self)->int:
+        with closing(self.connect()) as connection, connection:
+            return connection.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def iter_orders(self)->Iterator[Order]:
+        """Iterates over the saved orders in the order they were first seen, without loading them all at once. The order details are included when they are known.
+
+        Yields:
+            Order: The saved orders.
+        """
+        connection = self.connect()
+        try:
+            cursor = connection.execute(f"SELECT product_name, product_price, delivery_status, {', '.join(DETAIL_COLUMNS)} FROM orders ORDER BY first_seen, rowid")
+            for product_name, product_price, delivery_status, *details in cursor:
+                order = Order(product_name=product_name, product_price=product_price, delivery_status=delivery_status)
+                order.update({column: value for column, value in zip(DETAIL_COLUMNS, details) if value is not None})
+                yield order
+        finally:
+            connection.close()
+
+    def export_json(self, path:str)->int:
+        """Streams the saved orders into a JSON file, in the {"orders": [...]} format of the OutputOrders call.
+
+        Args:
+            path (str): The path of the JSON file.
+
+        Returns:
+            int: The number of exported orders.
+        """
+        count = 0
+        with open(path, "w") as f:
+            f.write('{"orders": [')
+            for order in self.iter_orders():
+                f.write((", " if count else "") + json.dumps(order))
+                count += 1
+            f.write("]}")
+        return count
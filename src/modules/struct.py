@@ -1,28 +1,103 @@
-from typing import Sequence, TypedDict, Annotated, Literal
+from typing import Sequence, TypedDict, Annotated, Literal, Optional
 from langchain_core.messages import BaseMessage
 from playwright.async_api import Page
 import operator
 from langchain_core.pydantic_v1 import BaseModel, Field
+from src.modules.orders import merge_orders
 
 
 class BBox(TypedDict):
     """Defines the datatype for bounding boxes"""
     x: float
     y: float
+    width: float
+    height: float
     text: str
     type: str
     ariaLabel: str
 
 
+class ScreenshotConfig(BaseModel):
+    """Defines how the page screenshot is encoded before it is sent to the model"""
+    width: Optional[int] = Field(None, description="Target width of the image in pixels. Larger screenshots are downscaled to this width, keeping the aspect ratio. None keeps the full resolution.")
+    format: Literal['png','jpeg','webp'] = Field('png', description="Image format of the encoded screenshot.")
+    quality: int = Field(80, description="Encoding quality from 1 to 100. Used by the jpeg and webp formats.")
+    clip_to_bboxes: bool = Field(False, description="If true, the screenshot is clipped to the region covered by the bounding boxes.")
+    clip_margin: int = Field(16, description="Margin in pixels around the bounding boxes when clipping.")
+
+
+class ChangeDetectionConfig(BaseModel):
+    """Defines what the agent does when the page has not changed since the previous observation"""
+    policy: Literal['observe','reuse','off'] = Field('observe', description="'observe' tells the model that the page has not changed, without re-sending the screenshot. 'reuse' repeats the previous decision without calling the model, up to max_reuse times in a row, and then falls back to 'observe'. 'off' disables the change detection.")
+    max_reuse: int = Field(1, description="Maximum number of consecutive reused decisions with the 'reuse' policy.")
+    max_distance: int = Field(4, description="Maximum hamming distance between the screenshot hashes for the page to count as unchanged.")
+
+
+class CompactionConfig(BaseModel):
+    """Defines how the scratchpad is compacted before it is sent to the model"""
+    token_budget: int = Field(8000, description="Approximate token budget of the scratchpad in the prompt, including the summary.")
+    keep_recent: int = Field(6, description="Minimum number of recent scratchpad messages which are always kept verbatim.")
+    max_actions: int = Field(40, description="Maximum number of actions listed in the summary. Older actions are only counted.")
+    line_chars: int = Field(200, description="Maximum length of one action line in the summary.")
+
+
+class DescriptionConfig(BaseModel):
+    """Defines how the bounding boxes are described to the model"""
+    max_chars: int = Field(100, description="Maximum length of the label of one bounding box. Longer labels, like the text of a whole order card, are truncated.")
+    dedupe: bool = Field(True, description="If true, bounding boxes with the same type and label share one line, and runs of 'min_repeat' or more consecutive boxes which only differ in their numbers are collapsed into one line.")
+    min_repeat: int = Field(3, description="Minimum length of a run of similar bounding boxes to be collapsed.")
+    delta: bool = Field(False, description="If true, the bounding boxes which have the same ID, label and position as in the previous observation are only listed by ID with a short label.")
+    unchanged_chars: int = Field(24, description="Maximum length of the short label of an unchanged bounding box in the delta mode.")
+    move_tolerance: float = Field(4, description="Maximum change of the position in pixels for a bounding box to count as unchanged.")
+
+
+class PageProfile(BaseModel):
+    """Defines how the browser is launched and which requests of the pages are blocked"""
+    headless: bool = Field(False, description="If true, the browser runs without a window. The login handoff to the user needs a window, so use it with a saved login state.")
+    block_resource_types: Sequence[str] = Field(('image', 'media', 'font'), description="Playwright resource types which are not downloaded. The layout and the text of the page are kept.")
+    block_url_patterns: Sequence[str] = Field(
+        (r'doubleclick\.net', r'googlesyndication\.com', r'google-analytics\.com', r'googletagmanager\.com', r'facebook\.net', r'hotjar\.com', r'criteo\.(com|net)'),
+        description="Regular expressions of the urls which are not downloaded, like ads and trackers.",
+    )
+    measure_saved_bytes: bool = Field(False, description="If true, the size of every blocked response is looked up with a HEAD request in the background, to report the bytes saved. This sends one extra request per blocked resource.")
+
+
+class RoutingConfig(BaseModel):
+    """Defines which steps of the agent go to a cheaper model instead of the main one"""
+    cheap_model: str = Field("gpt-4o-mini", description="The OpenAI model for the routine steps.")
+    cheap_tools: Sequence[str] = Field(('scroll', 'scroll_to_end', 'wait', 'extract_orders'), description="The tools after which the next step counts as routine, if the url is the same as at the previous step and the page changed.")
+    text_only: bool = Field(True, description="If true, the routine steps are sent without the screenshot, with only the descriptions of the bounding boxes.")
+
+
 class AgentState(TypedDict):
     """Defines the datatype for the agent state"""
     page: Page
     input: str
     img: str
+    img_mime: str
+    img_bytes: int
+    screenshot_config: ScreenshotConfig
     bboxes: Sequence[BBox]
     scratchpad: Annotated[Sequence[BaseMessage],operator.add]
     bbox_descriptions: Sequence[str]
+    descriptions: DescriptionConfig
+    previous_bboxes: Sequence[BBox]
+    description_tokens_saved: int
     tool_output: str
+    change_detection: ChangeDetectionConfig
+    page_signature: str
+    page_unchanged: bool
+    unchanged_streak: int
+    compaction: CompactionConfig
+    scratchpad_summary: dict
+    summarized_messages: int
+    prompt_tokens: int
+    routing: RoutingConfig
+    page_url: str
+    orders: Annotated[Sequence[dict],merge_orders]
+    order_store: str
+    orders_export: str
+    resume_node: str
 
 
 class CompleteTask(BaseModel):
@@ -37,6 +112,15 @@ class Order(TypedDict):
     delivery_status: Literal[0,1,2,3] = Field(description="Delivery status of the product. If delivered, then 1. If not delivered, then 0. If the product is refunded, then 2. If cancelled, then 3.")
 
 
+class OrderDetails(TypedDict, total=False):
+    """The extended fields of an order. The ids are read from the link of its card on the orders page, the other fields from its order details page"""
+    order_id: str
+    item_id: str
+    order_date: str
+    seller: str
+    item_count: int
+
+
 class OutputOrders(BaseModel):
-    """Call this to save the extracted orders in a structured format. This will be used to save the orders in the database. MUST BE CALLED BEFORE CALLING CompleteTask."""
+    """Call this to save the extracted orders in a structured format. This will be used to save the orders in the database. Orders already extracted with extract_orders are added automatically, so only pass the orders read from the screenshots. MUST BE CALLED BEFORE CALLING CompleteTask."""
     orders: Sequence[Order] = Field(description="The list of orders")
\ No newline at end of file
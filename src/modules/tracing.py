@@ -0,0 +1,169 @@
+from typing import Any, Optional
+from uuid import UUID
+import inspect
+import json
+import math
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+
+def percentile(values:list, q:float)->float:
+    """Returns the q-th percentile (0-100) of the values, by the nearest rank method."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class Tracer(BaseCallbackHandler):
+    """Collects span timings, token counts and screenshot sizes of agent runs, without LangSmith.
+
+    Pass it as a callback in the run config to time every graph node and every runnable inside the agent chain (annotate, format_descriptions, call_llm, ...), and to count the tokens of every llm call. Wrap the page in a TracedPage to also time every Playwright call. `summary` gives p50/p95 per span, and the results can be exported as JSON or in the Prometheus text format."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.spans = []
+        self.steps = []
+        self.starts = {}
+
+    def record(self, name:str, kind:str, duration:float):
+        """Records one span.
+
+        Args:
+            name (str): The name of the span, like the node name or the Playwright method.
+            kind (str): The kind of span: 'node', 'runnable', 'llm' or 'playwright'.
+            duration (float): The duration in seconds.
+        """
+        self.spans.append({"name": name, "kind": kind, "step": len(self.steps), "duration": duration})
+
+    def on_chain_start(self, serialized:dict, inputs:Any, *, run_id:UUID, tags:Optional[list]=None, metadata:Optional[dict]=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        if not name or "langsmith:hidden" in (tags or []):
+            return
+        kind = "node" if (metadata or {}).get("langgraph_node") == name else "runnable"
+        # A node runnable can have the same name as its node, like structure_orders.
+        if kind == "node" and any(start[:2] == (name, "node") for start in self.starts.values()):
+            kind = "runnable"
+        if kind == "node" and name == "agent":
+            self.steps.append({"step": len(self.steps) + 1, "prompt_tokens": 0, "completion_tokens": 0, "img_bytes": 0})
+        self.starts[run_id] = (name, kind, time.perf_counter())
+
+    def on_chain_end(self, outputs:Any, *, run_id:UUID, **kwargs):
+        if run_id not in self.starts:
+            return
+        name, kind, start = self.starts.pop(run_id)
+        self.record(name, kind, time.perf_counter() - start)
+        if kind == "node" and name == "agent" and isinstance(outputs, dict) and self.steps:
+            self.steps[-1]["img_bytes"] = outputs.get("img_bytes") or 0
+
+    def on_chain_error(self, error:BaseException, *, run_id:UUID, **kwargs):
+        self.starts.pop(run_id, None)
+
+    def on_chat_model_start(self, serialized:dict, messages:list, *, run_id:UUID, **kwargs):
+        self.starts[run_id] = ("llm", "llm", time.perf_counter())
+
+    def on_llm_end(self, response:LLMResult, *, run_id:UUID, **kwargs):
+        if run_id in self.starts:
+            name, kind, start = self.starts.pop(run_id)
+            self.record(name, kind, time.perf_counter() - start)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage and response.generations and response.generations[0]:
+            message = getattr(response.generations[0][0], "message", None)
+            usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        if self.steps:
+            self.steps[-1]["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            self.steps[-1]["completion_tokens"] += usage.get("completion_tokens", 0)
+
+    def on_llm_error(self, error:BaseException, *, run_id:UUID, **kwargs):
+        self.starts.pop(run_id, None)
+
+    def summary(self)->dict:
+        """Summarizes the run.
+
+        Returns:
+            dict: The count, total, p50, p95 and max duration per span with key 'spans', the totals with key 'totals', and the per step tokens and image bytes with key 'steps'.
+        """
+        durations = {}
+        for span in self.spans:
+            durations.setdefault((span["kind"], span["name"]), []).append(span["duration"])
+        spans = [
+            {
+                "kind": kind,
+                "name": name,
+                "count": len(values),
+                "total": sum(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "max": max(values),
+            }
+            for (kind, name), values in sorted(durations.items())
+        ]
+        totals = {
+            "steps": len(self.steps),
+            "prompt_tokens": sum(step["prompt_tokens"] for step in self.steps),
+            "completion_tokens": sum(step["completion_tokens"] for step in self.steps),
+            "img_bytes": sum(step["img_bytes"] for step in self.steps),
+        }
+        return {"spans": spans, "totals": totals, "steps": self.steps}
+
+    def print_summary(self):
+        """Prints the per span timings and the totals of the run."""
+        summary = self.summary()
+        print(f"{'kind':<11} {'span':<24} {'count':>6} {'total s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for span in summary["spans"]:
+            print(f"{span['kind']:<11} {span['name'][:24]:<24} {span['count']:>6} {span['total']:>9.2f} {span['p50'] * 1000:>8.1f} {span['p95'] * 1000:>8.1f}")
+        print(", ".join(f"{key}: {value}" for key, value in summary["totals"].items()))
+
+    def export_json(self, path:str):
+        """Writes the summary and all the raw spans to a JSON file."""
+        with open(path, "w") as f:
+            json.dump({**self.summary(), "raw_spans": self.spans}, f, indent=2)
+
+    def export_prometheus(self, path:str):
+        """Writes the summary to a file in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = ["# TYPE agent_span_seconds summary"]
+        for span in summary["spans"]:
+            labels = f'kind="{span["kind"]}",name="{span["name"]}"'
+            lines.append(f'agent_span_seconds{{{labels},quantile="0.5"}} {span["p50"]:.6f}')
+            lines.append(f'agent_span_seconds{{{labels},quantile="0.95"}} {span["p95"]:.6f}')
+            lines.append(f'agent_span_seconds_sum{{{labels}}} {span["total"]:.6f}')
+            lines.append(f'agent_span_seconds_count{{{labels}}} {span["count"]}')
+        for key, value in summary["totals"].items():
+            lines.append(f"# TYPE agent_{key}_total counter")
+            lines.append(f"agent_{key}_total {value}")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def export(self, path:str):
+        """Exports to JSON if the path ends with .json, else in the Prometheus text format."""
+        if path.endswith(".json"):
+            self.export_json(path)
+        else:
+            self.export_prometheus(path)
+
+
+class TracedPage:
+    """Wraps a Playwright Page, or one of its helpers like the mouse and the keyboard, and records every awaited call on it as a 'playwright' span of the tracer. Everything else is passed through to the wrapped object."""
+
+    def __init__(self, target:Any, tracer:Tracer, prefix:str="page"):
+        self._target = target
+        self._tracer = tracer
+        self._prefix = prefix
+
+    def __getattr__(self, name:str)->Any:
+        attribute = getattr(self._target, name)
+        if name in ("mouse", "keyboard"):
+            return TracedPage(attribute, self._tracer, name)
+        if not inspect.iscoroutinefunction(attribute):
+            return attribute
+
+        async def traced(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await attribute(*args, **kwargs)
+            finally:
+                self._tracer.record(f"{self._prefix}.{name}", "playwright", time.perf_counter() - start)
+        return traced
@@ -0,0 +1,24 @@
+// Resolves to true once the DOM has not changed for quietMs, or to false if it
+// keeps changing for timeoutMs.
+({ quietMs, timeoutMs }) =>
+  new Promise((resolve) => {
+    var quietTimer, capTimer;
+    var observer = new MutationObserver(() => {
+      clearTimeout(quietTimer);
+      quietTimer = setTimeout(done, quietMs, true);
+    });
+    function done(quiet) {
+      observer.disconnect();
+      clearTimeout(quietTimer);
+      clearTimeout(capTimer);
+      resolve(quiet);
+    }
+    observer.observe(document, {
+      childList: true,
+      subtree: true,
+      attributes: true,
+      characterData: true,
+    });
+    quietTimer = setTimeout(done, quietMs, true);
+    capTimer = setTimeout(done, timeoutMs, false);
+  })
@@ -1,4 +1,4 @@
-const customCSS = `
+var customCSS = `
     ::-webkit-scrollbar {
         width: 10px;
     }
@@ -14,105 +14,183 @@ const customCSS = `
     }
 `;
 
-const styleTag = document.createElement("style");
-styleTag.textContent = customCSS;
-document.head.append(styleTag);
+// This script is installed as an init script, so it runs before the document
+// has a <head> and may be evaluated more than once in the same window.
+function installStyle() {
+  if (document.getElementById("mark-page-style")) {
+    return;
+  }
+  const styleTag = document.createElement("style");
+  styleTag.id = "mark-page-style";
+  styleTag.textContent = customCSS;
+  document.head.append(styleTag);
+}
 
-let labels = [];
+if (document.head) {
+  installStyle();
+} else {
+  document.addEventListener("DOMContentLoaded", installStyle);
+}
+
+var labels = window.labels || [];
 
 function unmarkPage() {
   // Unmark page logic
   for (const label of labels) {
-    document.body.removeChild(label);
+    label.remove();
   }
   labels = [];
 }
 
-function markPage() {
-  unmarkPage();
-
-  var bodyRect = document.body.getBoundingClientRect();
-
-  var items = Array.prototype.slice
-    .call(document.querySelectorAll("*"))
-    .map(function (element) {
-      var vw = Math.max(
-        document.documentElement.clientWidth || 0,
-        window.innerWidth || 0
-      );
-      var vh = Math.max(
-        document.documentElement.clientHeight || 0,
-        window.innerHeight || 0
-      );
-      var textualContent = element.textContent.trim().replace(/\s{2,}/g, " ");
-      var elementType = element.tagName.toLowerCase();
-      var ariaLabel = element.getAttribute("aria-label") || "";
-
-      var rects = [...element.getClientRects()]
-        .filter((bb) => {
-          var center_x = bb.left + bb.width / 2;
-          var center_y = bb.top + bb.height / 2;
-          var elAtCenter = document.elementFromPoint(center_x, center_y);
-
-          return elAtCenter === element || element.contains(elAtCenter);
-        })
-        .map((bb) => {
-          const rect = {
-            left: Math.max(0, bb.left),
-            top: Math.max(0, bb.top),
-            right: Math.min(vw, bb.right),
-            bottom: Math.min(vh, bb.bottom),
-          };
-          return {
-            ...rect,
-            width: rect.right - rect.left,
-            height: rect.bottom - rect.top,
-          };
-        });
+function isClickable(element, style) {
+  return (
+    element.tagName === "INPUT" ||
+    element.tagName === "TEXTAREA" ||
+    element.tagName === "SELECT" ||
+    element.tagName === "BUTTON" ||
+    element.tagName === "A" ||
+    element.onclick != null ||
+    style.cursor == "pointer" ||
+    element.tagName === "IFRAME" ||
+    element.tagName === "VIDEO"
+  );
+}
 
-      var area = rects.reduce((acc, rect) => acc + rect.width * rect.height, 0);
+function visibleRects(element, vw, vh) {
+  return [...element.getClientRects()]
+    .filter((bb) => {
+      var center_x = bb.left + bb.width / 2;
+      var center_y = bb.top + bb.height / 2;
+      var elAtCenter = document.elementFromPoint(center_x, center_y);
 
+      return elAtCenter === element || element.contains(elAtCenter);
+    })
+    .map((bb) => {
+      const rect = {
+        left: Math.max(0, bb.left),
+        top: Math.max(0, bb.top),
+        right: Math.min(vw, bb.right),
+        bottom: Math.min(vh, bb.bottom),
+      };
       return {
-        element: element,
-        include:
-          element.tagName === "INPUT" ||
-          element.tagName === "TEXTAREA" ||
-          element.tagName === "SELECT" ||
-          element.tagName === "BUTTON" ||
-          element.tagName === "A" ||
-          element.onclick != null ||
-          window.getComputedStyle(element).cursor == "pointer" ||
-          element.tagName === "IFRAME" ||
-          element.tagName === "VIDEO",
-        area,
-        rects,
-        text: textualContent,
-        type: elementType,
-        ariaLabel: ariaLabel,
+        ...rect,
+        width: rect.right - rect.left,
+        height: rect.bottom - rect.top,
       };
-    })
-    .filter((item) => item.include && item.area >= 20);
+    });
+}
 
-  // Only keep inner clickable items
-  items = items.filter(
-    (x) => !items.some((y) => x.element.contains(y.element) && !(x == y))
+// Whether an element has a fixed or sticky descendant, which can be drawn
+// outside of the box of the element even if the element clips its overflow.
+function containsPinned(element) {
+  var walker = document.createTreeWalker(element, NodeFilter.SHOW_ELEMENT);
+  while (walker.nextNode()) {
+    var position = window.getComputedStyle(walker.currentNode).position;
+    if (position === "fixed" || position === "sticky") {
+      return true;
+    }
+  }
+  return false;
+}
+
+function indexClickables(vw, vh) {
+  // Single pre-order walk over the DOM. Subtrees that cannot produce a visible
+  // box are rejected as a whole: display:none elements, and elements with a
+  // non-empty box outside the viewport that clip their overflow and have no
+  // fixed or sticky descendants, like modals mounted in a 0x0 wrapper. Every
+  // other element is visited once and only clickable, on-screen elements pay
+  // for the hit-testing below.
+  var candidates = new Set();
+  var walker = document.createTreeWalker(
+    document.documentElement,
+    NodeFilter.SHOW_ELEMENT,
+    {
+      acceptNode: function (element) {
+        var style = window.getComputedStyle(element);
+        if (style.display === "none") {
+          return NodeFilter.FILTER_REJECT;
+        }
+        var bb = element.getBoundingClientRect();
+        var onScreen =
+          bb.right > 0 && bb.bottom > 0 && bb.left < vw && bb.top < vh;
+        var hasBox = bb.width > 0 && bb.height > 0;
+        if (
+          hasBox &&
+          !onScreen &&
+          style.position !== "fixed" &&
+          style.overflowX !== "visible" &&
+          style.overflowY !== "visible" &&
+          !containsPinned(element)
+        ) {
+          return NodeFilter.FILTER_REJECT;
+        }
+        if (onScreen && isClickable(element, style)) {
+          candidates.add(element);
+        }
+        return NodeFilter.FILTER_ACCEPT;
+      },
+    }
   );
+  var order = [];
+  while (walker.nextNode()) {
+    order.push(walker.currentNode);
+  }
 
-  // Function to generate random colors
-  function getRandomColor() {
-    var letters = "0123456789ABCDEF";
-    var color = "#";
-    for (var i = 0; i < 6; i++) {
-      color += letters[Math.floor(Math.random() * 16)];
+  // Walk the visited elements in reverse document order, so every element is
+  // seen after all of its descendants. An element that is itself kept, or that
+  // contains a kept element, marks its parent as covered. A clickable element
+  // is kept only if nothing below it was, i.e. it is an innermost clickable.
+  var covered = new Set();
+  var items = [];
+  for (var i = order.length - 1; i >= 0; i--) {
+    var element = order[i];
+    var keep = false;
+    if (!covered.has(element) && candidates.has(element)) {
+      var rects = visibleRects(element, vw, vh);
+      var area = rects.reduce((acc, rect) => acc + rect.width * rect.height, 0);
+      if (area >= 20) {
+        keep = true;
+        items.push({
+          element: element,
+          rects,
+          text: element.textContent.trim().replace(/\s{2,}/g, " "),
+          type: element.tagName.toLowerCase(),
+          ariaLabel: element.getAttribute("aria-label") || "",
+        });
+      }
+    }
+    if ((keep || covered.has(element)) && element.parentElement) {
+      covered.add(element.parentElement);
     }
-    return color;
+  }
+  return items.reverse();
+}
+
+function markPage() {
+  unmarkPage();
+
+  var vw = Math.max(
+    document.documentElement.clientWidth || 0,
+    window.innerWidth || 0
+  );
+  var vh = Math.max(
+    document.documentElement.clientHeight || 0,
+    window.innerHeight || 0
+  );
+
+  var items = indexClickables(vw, vh);
+
+  // Function to generate the color of a label from its index. The colors are
+  // the same on every pass, so identical pages give identical screenshots.
+  function getLabelColor(index) {
+    return `hsl(${(index * 137.5) % 360}, 80%, 35%)`;
   }
 
   // Lets create a floating border on top of these elements that will always be visible
   items.forEach(function (item, index) {
     item.rects.forEach((bbox) => {
       newElement = document.createElement("div");
-      var borderColor = getRandomColor();
+      var borderColor = getLabelColor(index);
       newElement.style.outline = `2px dashed ${borderColor}`;
       newElement.style.position = "fixed";
       newElement.style.left = bbox.left + "px";
@@ -148,6 +226,8 @@ function markPage() {
     item.rects.map(({ left, top, width, height }) => ({
       x: (left + left + width) / 2,
       y: (top + top + height) / 2,
+      width: width,
+      height: height,
       type: item.type,
       text: item.text,
       ariaLabel: item.ariaLabel,
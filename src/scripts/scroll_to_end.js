@@ -0,0 +1,127 @@
+// Scrolls the window to the bottom until the sentinel shows up, the document
+// stops growing, or maxScrolls is reached. Elements added to the DOM on the way
+// are collected, so that the items of virtualized lists are not lost.
+async ({ sentinelText, sentinelSelector, maxScrolls, stallMs, maxChars }) => {
+  var added = [];
+  var pending = [];
+  // Text set on an existing element, like the sentinel of an end marker, is
+  // only checked for the sentinel.
+  var pendingText = [];
+  function collect(mutations) {
+    for (const mutation of mutations) {
+      for (const node of mutation.addedNodes) {
+        if (node.nodeType === Node.ELEMENT_NODE) {
+          pending.push(node);
+        } else if (node.nodeType === Node.TEXT_NODE) {
+          pendingText.push(node);
+        }
+      }
+    }
+  }
+  var observer = new MutationObserver(collect);
+  observer.observe(document.body, { childList: true, subtree: true });
+
+  // The text of the node without the content of scripts, styles and templates,
+  // which may contain the sentinel text without showing it.
+  var HIDDEN_TAGS = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE"]);
+  function renderedText(node) {
+    if (node.nodeType === Node.TEXT_NODE) {
+      return node.parentNode && HIDDEN_TAGS.has(node.parentNode.nodeName)
+        ? ""
+        : node.nodeValue;
+    }
+    if (HIDDEN_TAGS.has(node.nodeName)) {
+      return "";
+    }
+    var walker = document.createTreeWalker(node, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+      acceptNode: (child) =>
+        HIDDEN_TAGS.has(child.nodeName)
+          ? NodeFilter.FILTER_REJECT
+          : NodeFilter.FILTER_ACCEPT,
+    });
+    var text = "";
+    while (walker.nextNode()) {
+      if (walker.currentNode.nodeType === Node.TEXT_NODE) {
+        text += walker.currentNode.nodeValue;
+      }
+    }
+    return text;
+  }
+
+  function hasSentinel(nodes) {
+    if (sentinelSelector && document.querySelector(sentinelSelector)) {
+      return true;
+    }
+    return (
+      !!sentinelText &&
+      nodes.some((node) => renderedText(node).includes(sentinelText))
+    );
+  }
+
+  function sleep(ms) {
+    return new Promise((resolve) => setTimeout(resolve, ms));
+  }
+
+  var reason = "max_scrolls";
+  var scrolls = 0;
+  if (hasSentinel([document.body])) {
+    reason = "sentinel";
+  } else {
+    for (; scrolls < maxScrolls; scrolls++) {
+      var height = document.documentElement.scrollHeight;
+      window.scrollTo(0, height);
+      var waited = 0;
+      while (
+        document.documentElement.scrollHeight <= height &&
+        waited < stallMs
+      ) {
+        await sleep(100);
+        waited += 100;
+      }
+      // Let the batch that triggered the growth finish rendering.
+      await sleep(100);
+      collect(observer.takeRecords());
+      var batch = pending;
+      var batchText = pendingText;
+      pending = [];
+      pendingText = [];
+      added.push(...batch);
+      if (hasSentinel(batch.concat(batchText))) {
+        reason = "sentinel";
+        scrolls++;
+        break;
+      }
+      if (document.documentElement.scrollHeight <= height) {
+        reason = "stalled";
+        scrolls++;
+        break;
+      }
+    }
+  }
+  observer.disconnect();
+
+  // Keep only the outermost added elements.
+  var addedSet = new Set(added);
+  var roots = added.filter((node) => {
+    for (var parent = node.parentElement; parent; parent = parent.parentElement) {
+      if (addedSet.has(parent)) {
+        return false;
+      }
+    }
+    return true;
+  });
+  var text = roots
+    .map((node) => (node.innerText || node.textContent || "").trim())
+    .filter((t) => t)
+    .join("\n")
+    .slice(0, maxChars);
+
+  return {
+    reason: reason,
+    scrolls: scrolls,
+    height: document.documentElement.scrollHeight,
+    added: roots.length,
+    html: roots.map((node) => node.outerHTML).join("\n"),
+    text: text,
+  };
+}
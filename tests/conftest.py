@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def browser():
+    """A headless firefox for the tests of the page scripts. The tests are skipped if no playwright browser is installed."""
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as p:
+        try:
+            browser = p.firefox.launch(headless=True)
+        except sync_api.Error as error:
+            pytest.skip(f"no playwright browser: {error.message.splitlines()[0]}")
+        yield browser
+        browser.close()
+
+
+@pytest.fixture
+def page(browser):
+    page = browser.new_page(viewport={'width':1280, 'height':800})
+    yield page
+    page.close()
@@ -0,0 +1,23 @@
+import json
+from src.modules.auth import storage_state_expired
+
+
+def write_state(tmp_path, cookies:list)->str:
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"cookies": cookies, "origins": []}))
+    return str(path)
+
+
+def test_state_with_an_expired_tracking_cookie_is_restored(tmp_path):
+    path = write_state(tmp_path, [
+        {"name": "at", "domain": ".flipkart.com", "expires": 2000},
+        {"name": "_ga_tracker", "domain": ".flipkart.com", "expires": 500},
+    ])
+    assert not storage_state_expired(path, now=1000)
+
+
+def test_state_without_valid_cookies_is_expired(tmp_path):
+    assert storage_state_expired(str(tmp_path / "missing.json"))
+    assert storage_state_expired(write_state(tmp_path, [{"name": "at", "domain": ".example.com", "expires": -1}]), now=1000)
+    assert storage_state_expired(write_state(tmp_path, [{"name": "at", "domain": ".flipkart.com", "expires": 500}]), now=1000)
+    assert not storage_state_expired(write_state(tmp_path, [{"name": "at", "domain": "www.flipkart.com", "expires": -1}]), now=1000)
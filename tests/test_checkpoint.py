@@ -0,0 +1,46 @@
+import json
+from langchain_core.messages import AIMessage, HumanMessage
+from src.modules.checkpoint import Checkpointer, deserialize_state, serialize_state
+from src.modules.struct import RoutingConfig, ScreenshotConfig
+
+
+def test_state_round_trip():
+    state = {
+        'page': object(),
+        'input': "Get my orders",
+        'scratchpad': [
+            AIMessage(content="Thought: scroll.", additional_kwargs={"function_call": {"name": "scroll", "arguments": "{\"target\": \"WINDOW\"}"}}),
+            HumanMessage(content="Scrolled down"),
+        ],
+        'screenshot_config': ScreenshotConfig(width=768, format='jpeg'),
+        'routing': RoutingConfig(cheap_tools=('scroll',)),
+        'orders': [{"product_name": "Kettle", "product_price": 1299, "delivery_status": 1, "order_id": "OD1"}],
+        'unchanged_streak': 2,
+        'resume_node': 'agent',
+        'img': "aGVsbG8=",
+        'img_mime': "image/png",
+        'img_bytes': 5,
+        'bboxes': [{"x": 1, "y": 2, "width": 3, "height": 4, "text": "Orders", "type": "a", "ariaLabel": ""}],
+        'previous_bboxes': [],
+    }
+    restored = deserialize_state(json.loads(json.dumps(serialize_state(state))))
+    assert set(restored) == set(state) - {'page', 'resume_node', 'img', 'img_mime', 'img_bytes', 'bboxes', 'previous_bboxes'}
+    assert restored['scratchpad'] == state['scratchpad']
+    assert restored['screenshot_config'] == state['screenshot_config']
+    assert list(restored['routing'].cheap_tools) == ['scroll']
+    assert restored['orders'] == state['orders']
+    assert restored['unchanged_streak'] == 2
+    # A tool node due next acts on the bounding boxes of the last observation.
+    assert serialize_state(state, 'click')['bboxes'] == state['bboxes']
+    assert 'bboxes' not in serialize_state(state, 'update_scratchpad')
+    assert 'img' not in serialize_state(state, 'click')
+
+
+def test_complete_runs_are_not_resumed(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    checkpointer = Checkpointer(str(path))
+    assert checkpointer.load() is None
+    path.write_text(json.dumps({'next': '__end__', 'url': "about:blank", 'scroll': [0, 0], 'state': {}}))
+    assert checkpointer.load() is None
+    path.write_text(json.dumps({'next': 'agent', 'url': "about:blank", 'scroll': [0, 0], 'state': {'input': "Get my orders"}}))
+    assert checkpointer.load()['state'] == {'input': "Get my orders"}
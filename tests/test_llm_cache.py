@@ -0,0 +1,46 @@
+import base64
+from io import BytesIO
+from langchain_core.messages import HumanMessage
+from langchain_core.prompt_values import ChatPromptValue
+from PIL import Image, ImageDraw
+from src.modules.llm_cache import LLMCache, cache_key
+
+
+def screenshot(noise:int=0)->str:
+    image = Image.new("RGB", (320, 200), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((20, 20, 150, 60), fill="navy")
+    draw.rectangle((20, 100, 300, 180), fill="gray")
+    for i in range(noise):
+        image.putpixel((200 + i, 30), (250, 250, 250))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def prompt(img:str, text:str="Step took 1.23s")->ChatPromptValue:
+    return ChatPromptValue(messages=[HumanMessage(content=[
+        {"type": "text", "text": text},
+        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img}"}},
+    ])])
+
+
+def test_screenshots_of_the_same_page_share_a_key():
+    assert screenshot() != screenshot(noise=3)
+    assert cache_key(prompt(screenshot()), "gpt-4o") == cache_key(prompt(screenshot(noise=3), "Step took 2.50s"), "gpt-4o")
+
+
+def test_key_changes_with_the_text_and_the_model():
+    key = cache_key(prompt(screenshot()), "gpt-4o")
+    assert cache_key(prompt(screenshot(), "Other step"), "gpt-4o") != key
+    assert cache_key(prompt(screenshot()), "gpt-4o-mini") != key
+
+
+def test_skipped_kinds_are_not_lookups(tmp_path):
+    cache = LLMCache(str(tmp_path), skip_kinds=('cheap',))
+    assert not cache.enabled_for(('cheap', 'text_only'))
+    assert cache.enabled_for(('main', 'screenshot'))
+    assert cache.enabled_for(())
+    assert cache.get("missing") is None
+    assert (cache.skipped, cache.misses, cache.hit_rate) == (1, 1, 0.0)
+    assert str(cache).startswith("1 lookups with 0 memory hits")
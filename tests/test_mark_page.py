@@ -0,0 +1,49 @@
+import base64
+from langchain_core.messages import HumanMessage
+from langchain_core.prompt_values import ChatPromptValue
+from src.modules.helper import read_resource
+from src.modules.llm_cache import cache_key
+
+
+def mark(page, html:str)->list:
+    page.set_content(html)
+    page.evaluate(read_resource("scripts/mark_page.js"))
+    return page.evaluate("markPage()")
+
+
+def test_labels_fixed_modal_in_empty_clipped_wrapper(page):
+    bboxes = mark(page, """
+        <div style="overflow:hidden; width:0; height:0">
+          <div style="position:fixed; top:100px; left:100px; width:300px; height:200px"><button>Close</button></div>
+        </div>""")
+    assert "Close" in [bbox["text"] for bbox in bboxes]
+
+
+def test_labels_fixed_banner_in_offscreen_clipped_wrapper(page):
+    bboxes = mark(page, """
+        <div style="height:3000px"></div>
+        <div style="overflow:hidden; height:200px">
+          <div style="position:fixed; bottom:0; left:0; width:400px; height:60px"><button>Accept cookies</button></div>
+        </div>""")
+    assert "Accept cookies" in [bbox["text"] for bbox in bboxes]
+
+
+def test_skips_offscreen_clipped_list(page):
+    bboxes = mark(page, """
+        <button>Buy</button>
+        <div style="height:3000px"></div>
+        <div style="overflow:auto; height:200px"><button>Hidden</button></div>""")
+    assert [bbox["text"] for bbox in bboxes] == ["Buy"]
+
+
+def test_two_passes_give_the_same_cache_key(page):
+    page.set_content("<button>Buy</button> <a href='#'>Orders</a> <input aria-label='Search'>")
+    page.evaluate(read_resource("scripts/mark_page.js"))
+    keys = []
+    for _ in range(2):
+        page.evaluate("markPage()")
+        img = base64.b64encode(page.screenshot()).decode()
+        page.evaluate("unmarkPage()")
+        message = HumanMessage(content=[{"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img}"}}])
+        keys.append(cache_key(ChatPromptValue(messages=[message]), "gpt-4o"))
+    assert keys[0] == keys[1]
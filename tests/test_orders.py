@@ -0,0 +1,46 @@
+from src.modules.extraction import parse_order_card, parse_orders, parse_status
+from src.modules.orders import merge_orders, order_key
+
+
+def test_order_key_prefers_the_order_id():
+    assert order_key({"product_name": "Mi Band 5", "product_price": 2499, "order_id": "OD1", "item_id": "7"}) == "id:OD1:7"
+    assert order_key({"product_name": "Mi Band 5", "product_price": 2499, "order_id": "OD1"}) == "id:OD1:"
+    assert order_key({"product_name": "Mi  Band-5", "product_price": 2499}) == "mi band 5|2499"
+
+
+def test_parse_order_card_takes_the_name_before_the_status():
+    order = parse_order_card(["Samsung Galaxy Ordered Case", "₹299", "Cancelled"], "/order_details?order_id=OD1&item_id=7")
+    assert order == {"product_name": "Samsung Galaxy Ordered Case", "product_price": 299, "delivery_status": 3, "order_id": "OD1", "item_id": "7"}
+
+
+def test_parse_order_card_skips_attributes_and_reads_the_status_line():
+    order = parse_order_card(["₹1,299", "Boat Rockerz 450", "Color: Black", "Delivered on Mar 03"])
+    assert order == {"product_name": "Boat Rockerz 450", "product_price": 1299, "delivery_status": 1}
+    assert parse_order_card(["Boat Rockerz 450"]) is None
+
+
+def test_parse_status_matches_only_at_the_start_of_the_line():
+    assert parse_status("Your item has been Refunded") == 2
+    assert parse_status("Refund completed") == 2
+    assert parse_status("Out for delivery") == 0
+    assert parse_status("Phone Case Delivered Fast") is None
+
+
+def test_parse_orders_keeps_repeat_purchases_apart():
+    html = "".join(
+        f'<a href="/order_details?order_id={order_id}"><div>USB Cable</div><div>₹199</div><div>Delivered on Jan 2</div></a>'
+        for order_id in ("OD1", "OD2", "OD1")
+    )
+    assert [order["order_id"] for order in parse_orders(html)] == ["OD1", "OD2"]
+
+
+def test_merge_orders_folds_orders_without_id_into_the_page_orders():
+    page = [
+        {"product_name": "USB Cable", "product_price": 199, "delivery_status": 1, "order_id": "OD1"},
+        {"product_name": "USB Cable", "product_price": 199, "delivery_status": 1, "order_id": "OD2"},
+    ]
+    model = [{"product_name": "usb cable", "product_price": 199, "delivery_status": 1}]
+    assert merge_orders(page, model) == page
+    merged = merge_orders(model, [{**page[0], "seller": "RetailNet"}, page[1]])
+    assert len(merged) == 2
+    assert merged[0]["order_id"] == "OD1" and merged[0]["seller"] == "RetailNet"
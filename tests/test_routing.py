@@ -0,0 +1,44 @@
+import json
+from types import SimpleNamespace
+from langchain_core.messages import AIMessage, HumanMessage
+from src.modules.routing import TierStats, classify, is_valid_call
+from src.modules.struct import RoutingConfig
+
+
+def call(name:str, arguments:dict|None=None)->AIMessage:
+    return AIMessage(content="", additional_kwargs={"function_call": {"name": name, "arguments": json.dumps(arguments or {})}})
+
+
+def state(last:str|None, url:str="https://www.flipkart.com/account/orders", previous_url:str="https://www.flipkart.com/account/orders", unchanged:bool=False)->dict:
+    scratchpad = [call(last), HumanMessage(content="Scrolled down")] if last else []
+    return {'scratchpad': scratchpad, 'page': SimpleNamespace(url=url), 'page_url': previous_url, 'page_unchanged': unchanged}
+
+
+def test_routine_continuations_go_to_the_cheap_tier():
+    assert classify(state("scroll"), RoutingConfig()) == 'cheap'
+    assert classify(state("extract_orders"), RoutingConfig()) == 'cheap'
+
+
+def test_other_steps_stay_with_the_main_tier():
+    config = RoutingConfig()
+    assert classify(state(None), config) == 'main'
+    assert classify(state("click"), config) == 'main'
+    assert classify(state("scroll", url="https://www.flipkart.com/order_details"), config) == 'main'
+    assert classify(state("scroll", unchanged=True), config) == 'main'
+    assert classify(state("scroll"), RoutingConfig(cheap_tools=('wait',))) == 'main'
+
+
+def test_is_valid_call():
+    assert is_valid_call(call("scroll", {"target": "WINDOW"}), {"scroll"})
+    assert not is_valid_call(call("navigate"), {"scroll"})
+    assert not is_valid_call(AIMessage(content="", additional_kwargs={"function_call": {"name": "scroll", "arguments": "{"}}), {"scroll"})
+    assert not is_valid_call(AIMessage(content="Done"), {"scroll"})
+
+
+def test_tier_stats_price_the_tokens():
+    stats = TierStats()
+    stats.record('cheap', "gpt-4o-mini", 0.5, AIMessage(content="", response_metadata={"token_usage": {"prompt_tokens": 1_000_000, "completion_tokens": 0}}))
+    stats.record('main', "gpt-4o", 0.5, AIMessage(content="", response_metadata={"token_usage": {"prompt_tokens": 1_000_000, "completion_tokens": 1_000_000}}))
+    assert stats.tiers['cheap']['cost'] == 0.15
+    assert stats.tiers['main']['cost'] == 12.5
+    assert TierStats().tiers == {}
@@ -0,0 +1,20 @@
+from src.benchmarks.mock_storefront import SENTINEL, start_storefront
+from src.modules.helper import read_resource
+
+
+def test_scrolls_until_all_orders_are_loaded(page):
+    server = start_storefront(50, page_size=20, popup=False)
+    try:
+        page.goto(f"{server.url}/account/orders")
+        result = page.evaluate(read_resource("scripts/scroll_to_end.js"), {
+            "sentinelText": SENTINEL,
+            "sentinelSelector": "",
+            "maxScrolls": 10,
+            "stallMs": 3000,
+            "maxChars": 4000,
+        })
+        assert result["reason"] == "sentinel"
+        assert result["scrolls"] > 0
+        assert page.locator("a.card").count() == 50
+    finally:
+        server.shutdown()
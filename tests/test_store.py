@@ -0,0 +1,69 @@
+import asyncio
+import json
+from langchain_core.messages import AIMessage
+from src.modules.orders import coerce_order
+from src.modules.runnables import structure_orders
+from src.modules.store import OrderStore
+
+
+def test_coerce_order_reads_price_texts():
+    assert coerce_order({"product_name": "Kettle", "product_price": "₹1,299", "delivery_status": "1"}) == {"product_name": "Kettle", "product_price": 1299, "delivery_status": 1}
+    assert coerce_order({"product_name": "Kettle", "product_price": 1299.0, "delivery_status": 0})["product_price"] == 1299
+
+
+def test_coerce_order_rejects_incomplete_orders():
+    assert coerce_order({"product_name": "Kettle", "product_price": "₹1,299"}) is None
+    assert coerce_order({"product_name": "Kettle", "product_price": "free", "delivery_status": 1}) is None
+    assert coerce_order({"product_name": "Kettle", "product_price": 10, "delivery_status": 7}) is None
+    assert coerce_order({"product_price": 10, "delivery_status": 1}) is None
+    assert coerce_order("Kettle") is None
+
+
+def test_upsert_skips_malformed_orders_and_updates_known_ones(tmp_path):
+    store = OrderStore(str(tmp_path / "orders.db"))
+    assert store.upsert([
+        {"product_name": "Kettle", "product_price": "₹1,299", "delivery_status": 0},
+        {"product_name": "Toaster", "product_price": 999},
+    ]) == 1
+    assert store.upsert([{"product_name": "kettle", "product_price": 1299, "delivery_status": 1, "seller": "HomeShop"}]) == 0
+    assert list(store.iter_orders()) == [{"product_name": "Kettle", "product_price": 1299, "delivery_status": 1, "seller": "HomeShop"}]
+
+
+def test_store_matches_orders_with_and_without_id(tmp_path):
+    store = OrderStore(str(tmp_path / "orders.db"))
+    assert store.upsert([{"product_name": "USB Cable", "product_price": 199, "delivery_status": 0}]) == 1
+    assert store.upsert([
+        {"product_name": "USB Cable", "product_price": 199, "delivery_status": 1, "order_id": "OD1"},
+        {"product_name": "USB Cable", "product_price": 199, "delivery_status": 1, "order_id": "OD2"},
+    ]) == 1
+    assert store.upsert([{"product_name": "USB Cable", "product_price": 199, "delivery_status": 1}]) == 0
+    assert sorted((order["order_id"], order["delivery_status"]) for order in store.iter_orders()) == [("OD1", 1), ("OD2", 1)]
+
+
+def test_export_json(tmp_path):
+    store = OrderStore(str(tmp_path / "orders.db"))
+    store.upsert([{"product_name": "Kettle", "product_price": 1299, "delivery_status": 1}])
+    assert store.export_json(str(tmp_path / "orders.json")) == 1
+    assert json.loads((tmp_path / "orders.json").read_text()) == {"orders": [{"product_name": "Kettle", "product_price": 1299, "delivery_status": 1}]}
+
+
+def output_orders(arguments:str)->dict:
+    message = AIMessage(content="", additional_kwargs={"function_call": {"name": "OutputOrders", "arguments": arguments}})
+    return {"scratchpad": [message], "orders": [], "order_store": "", "orders_export": ""}
+
+
+def test_structure_orders_saves_and_exports(tmp_path):
+    state = {**output_orders(json.dumps({"orders": [{"product_name": "Kettle", "product_price": "₹1,299", "delivery_status": 1}, {"product_name": "Toaster"}]})),
+             "order_store": str(tmp_path / "orders.db"), "orders_export": str(tmp_path / "orders.json")}
+    result = asyncio.run(structure_orders.ainvoke(state))
+    assert "1 orders were skipped" in result["tool_output"]
+    assert json.loads((tmp_path / "orders.json").read_text())["orders"] == [{"product_name": "Kettle", "product_price": 1299, "delivery_status": 1}]
+
+
+def test_structure_orders_asks_again_for_cut_off_arguments(tmp_path):
+    for arguments in ('{"orders": [{"product_name": "Kettle", "product_pri', '[1, 2]', '{"orders": "Kettle"}'):
+        state = {**output_orders(arguments), "order_store": str(tmp_path / "orders.db"), "orders_export": str(tmp_path / "orders.json")}
+        result = asyncio.run(structure_orders.ainvoke(state))
+        assert "smaller batches" in result["tool_output"]
+        assert "orders" not in result
+    assert not (tmp_path / "orders.json").exists()